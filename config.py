@@ -26,7 +26,10 @@ EXTRACTED_TEXT_DIR = os.getenv('EXTRACTED_TEXT_DIR', './extracted_texts')
 CHUNK_SIZE = 500  # characters per chunk
 CHUNK_OVERLAP = 100  # overlap between chunks
 EMBEDDING_DIMENSION = 768  # Cloudflare AI generates 768-dim embeddings
-BATCH_SIZE = 32  # Pinecone batch size
+
+# Hash the extracted text into the manifest (diagnostic only; costs a
+# full pass over the text of every processed file)
+TRACK_EXTRACTED_HASH = os.getenv('TRACK_EXTRACTED_HASH', 'false').lower() == 'true'
 
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -3,14 +3,139 @@ Generate embeddings using Cloudflare AI and store in Pinecone
 Supports batch processing and efficient vector storage
 """
 
+import array
+import itertools
 import json
 import logging
+import mmap
+import os
+import queue
+import sqlite3
+import sys
+import threading
 import time
 import hashlib
+from collections import defaultdict, deque
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Tuple
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    TimeoutError as FuturesTimeoutError,
+    wait as futures_wait,
+)
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pinecone import Pinecone, ServerlessSpec
+
+# orjson parses UTF-8 bytes in C, several times faster than stdlib json
+# on the large extracted-text documents; fall back to stdlib if missing
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# tiktoken sizes chunks in tokens (what the embedding model actually
+# consumes); fall back to character counts if missing
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+# xxhash (xxh3) hashes short id strings ~10x faster than MD5 and is
+# plenty for deterministic vector ids; fall back to MD5 if missing
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    xxhash = None
+    XXHASH_AVAILABLE = False
+
+# numpy lets in-flight embeddings live as float16 arrays (~1.5 KB per
+# 768-d vector) instead of lists of 24-byte Python floats (~18 KB);
+# fall back to plain lists if missing
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+def _source_digest(source_path: str) -> bytes:
+    """
+    Digest of a source file path, computed once per document
+
+    The full path (not just the name) goes into vector ids: the extractor
+    allows same-named PDFs in different subfolders of one subject tree,
+    and those must not collide.
+    """
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_64(source_path.encode()).digest()
+    return hashlib.md5(source_path.encode()).digest()[:8]
+
+
+def _vector_id(source_digest: bytes, chunk_index: int) -> str:
+    """
+    Deterministic vector id from a per-document digest and chunk index
+
+    The document part is hashed once (see _source_digest); per chunk only
+    12 bytes are mixed in, instead of re-hashing the file name every time.
+    """
+    payload = source_digest + chunk_index.to_bytes(4, 'little')
+    if XXHASH_AVAILABLE:
+        return f"vec_{xxhash.xxh3_64(payload).hexdigest()}"
+    return f"vec_{hashlib.md5(payload).hexdigest()[:12]}"
+
+
+def _parse_extracted_json(path_str: str):
+    """
+    Parse one *_extracted.json file (module-level so workers can pickle it)
+
+    The file is memory-mapped and decoded straight from the mapping, and
+    the result is projected down to the three fields the pipeline touches
+    so page offsets and other bookkeeping never enter the resident set.
+    """
+    try:
+        with open(path_str, 'rb') as f:
+            try:
+                buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # Empty file or filesystem without mmap support
+                buf = f.read()
+            try:
+                view = memoryview(buf)
+                try:
+                    raw = orjson.loads(view) if ORJSON_AVAILABLE else json.loads(bytes(view))
+                finally:
+                    view.release()
+            finally:
+                if isinstance(buf, mmap.mmap):
+                    buf.close()
+        return {
+            'text': raw['text'],
+            'pages': raw['pages'],
+            'metadata': raw['metadata']
+        }
+    except Exception as e:
+        logger.error(f"Error loading {path_str}: {e}")
+        return None
+
+
+def _vector_to_list(embedding) -> List[float]:
+    """Convert an in-memory embedding to JSON-ready floats at the API boundary"""
+    if NUMPY_AVAILABLE and isinstance(embedding, np.ndarray):
+        # Pinecone needs full-precision JSON floats; fp16 is in-memory only
+        return embedding.astype(np.float32).tolist()
+    return embedding
+
 from config import (
     CLOUDFLARE_API_TOKEN,
     CLOUDFLARE_ACCOUNT_ID,
@@ -21,7 +146,6 @@ from config import (
     CHUNK_SIZE,
     CHUNK_OVERLAP,
     EMBEDDING_DIMENSION,
-    BATCH_SIZE,
     LOG_LEVEL
 )
 
@@ -41,12 +165,200 @@ class CloudflareEmbedder:
         self.account_id = account_id
         self.base_url = f"https://api.cloudflare.com/client/v4/accounts/{account_id}/ai/run"
         self.model = "@cf/baai/bge-base-en-v1.5"
-        self.headers = {
+        # Formatted once; generate_embedding used to rebuild it per call
+        self.endpoint = f"{self.base_url}/{self.model}"
+        # Persistent session: reuses TCP/TLS connections across requests
+        # (~100 ms handshake saved per call) and retries 429/5xx with backoff
+        self.session = requests.Session()
+        self.session.headers.update({
             "Authorization": f"Bearer {api_token}",
             "Content-Type": "application/json"
-        }
+        })
+        retry = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({'POST'})
+        )
+        self.session.mount('https://', HTTPAdapter(
+            max_retries=retry,
+            pool_connections=self.MAX_CONCURRENT_REQUESTS,
+            pool_maxsize=self.MAX_CONCURRENT_REQUESTS
+        ))
         self.request_count = 0
         self.total_tokens_used = 0
+        self.cache_hits = 0
+        self._cache_conn = self._open_embedding_cache()
+        # Sized for one duplicate per in-flight batch request
+        self._hedge_pool = ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS * 2)
+        # Monotonic timestamp of the last request the adapter had to retry
+        # (429/5xx); hedging stands down while it is recent
+        self._throttled_at = -self.THROTTLE_COOLDOWN
+
+    def close(self):
+        """Release pooled sockets and the embedding-cache connection"""
+        self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+        if self._cache_conn is not None:
+            self._cache_conn.close()
+            self._cache_conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_embedding_cache(self):
+        """
+        Open (creating if needed) the on-disk embedding cache
+
+        Re-runs after small edits mostly see unchanged chunks; caching
+        hash(model + text) -> embedding turns those into local lookups
+        instead of repeated API calls.
+        """
+        try:
+            conn = sqlite3.connect(str(Path(__file__).parent / self.CACHE_FILE))
+            # WAL lets cache reads proceed while a batch of inserts commits
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vec BLOB)')
+            conn.commit()
+            return conn
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+            return None
+
+    def _cache_key(self, text: str) -> bytes:
+        """Cache key for text under the current model"""
+        return hashlib.sha256(f"{self.model}\x00{text}".encode()).digest()
+
+    def _cache_get_many(self, keys: List[bytes]) -> Dict[bytes, List[float]]:
+        """Return {key: embedding} for the keys already cached"""
+        if self._cache_conn is None or not keys:
+            return {}
+        found = {}
+        try:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ','.join('?' * len(part))
+                rows = self._cache_conn.execute(
+                    f'SELECT key, vec FROM embeddings WHERE key IN ({placeholders})', part)
+                for key, vec in rows:
+                    if NUMPY_AVAILABLE:
+                        found[bytes(key)] = np.frombuffer(vec, dtype=np.float32).astype(np.float16)
+                    else:
+                        found[bytes(key)] = list(array.array('f', vec))
+        except Exception as e:
+            logger.warning(f"Embedding cache read failed: {e}")
+        return found
+
+    def _cache_put_many(self, items: List[Tuple[bytes, List[float]]]):
+        """Store (key, embedding) pairs in the cache"""
+        if self._cache_conn is None or not items:
+            return
+        try:
+            self._cache_conn.executemany(
+                'INSERT OR REPLACE INTO embeddings (key, vec) VALUES (?, ?)',
+                [(key, array.array('f', _vector_to_list(vec)).tobytes()) for key, vec in items])
+            self._cache_conn.commit()
+        except Exception as e:
+            logger.warning(f"Embedding cache write failed: {e}")
+
+    # Cloudflare's BGE endpoint accepts an array of texts per request;
+    # one batched call replaces up to this many single-text round trips
+    MAX_TEXTS_PER_REQUEST = 100
+
+    # Batched requests kept in flight concurrently; the work is pure
+    # network wait, so threads overlap the round-trip latency
+    MAX_CONCURRENT_REQUESTS = 8
+
+    # On-disk embedding cache, next to the scripts like subject_mapping.json
+    CACHE_FILE = '.embedding_cache.sqlite'
+
+    # A duplicate request fires if the first is still pending after this
+    # many seconds; whichever answers first wins. Converts the endpoint's
+    # long-tail p99 into roughly a second median round trip
+    HEDGE_DELAY = 5.0
+
+    # No hedging for this long after the adapter retried a request: a
+    # throttled (429/5xx) primary is slow because of retry backoff, not
+    # tail latency, and a duplicate would amplify the very load that
+    # caused the throttling
+    THROTTLE_COOLDOWN = 30.0
+
+    def _post_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        POST a list of texts and return their embeddings
+
+        Args:
+            texts: Non-empty list of text strings
+
+        Returns:
+            list: One embedding per input text, or None on API error
+        """
+        payload = {
+            "text": texts
+        }
+
+        # Serialize/deserialize with orjson when available; the session
+        # already sends Content-Type: application/json
+        if ORJSON_AVAILABLE:
+            body = orjson.dumps(payload)
+        else:
+            body = json.dumps(payload).encode('utf-8')
+
+        response = self.session.post(
+            self.endpoint,
+            data=body,
+            timeout=30
+        )
+
+        # urllib3 records each status/backoff retry it performed; a
+        # non-empty history means the endpoint is throttling us
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            self._throttled_at = time.monotonic()
+
+        if response.status_code == 200:
+            result = orjson.loads(response.content) if ORJSON_AVAILABLE else response.json()
+            self.request_count += 1
+
+            if 'result' in result and 'data' in result['result']:
+                data = result['result']['data']
+                if NUMPY_AVAILABLE:
+                    # Hold the working set as fp16 arrays until upsert
+                    return [np.asarray(vec, dtype=np.float16) for vec in data]
+                return data
+            logger.error(f"Unexpected response format: {result}")
+            return None
+
+        logger.error(f"API error {response.status_code}: {response.text}")
+        return None
+
+    def _post_embeddings_hedged(self, texts: List[str]) -> List[List[float]]:
+        """
+        _post_embeddings with a hedged retry against tail latency
+
+        If the first request is still pending after HEDGE_DELAY, a
+        duplicate fires and the first response to arrive wins; the loser
+        is discarded (the call is idempotent). Costs one extra request
+        only on tail-latency outliers. While the endpoint is throttling
+        (any request recently needed a 429/5xx retry) the hedge is
+        suppressed and the primary is simply awaited.
+        """
+        primary = self._hedge_pool.submit(self._post_embeddings, texts)
+        try:
+            return primary.result(timeout=self.HEDGE_DELAY)
+        except FuturesTimeoutError:
+            pass
+        if time.monotonic() - self._throttled_at < self.THROTTLE_COOLDOWN:
+            logger.debug("Hedge suppressed during throttle cooldown")
+            return primary.result()
+        logger.debug("Request pending after %.1fs; hedging with a duplicate", self.HEDGE_DELAY)
+        backup = self._hedge_pool.submit(self._post_embeddings, texts)
+        done, _ = futures_wait({primary, backup}, return_when=FIRST_COMPLETED)
+        return done.pop().result()
 
     def generate_embedding(self, text: str) -> List[float]:
         """
@@ -65,31 +377,17 @@ class CloudflareEmbedder:
                 logger.warning("Empty text provided for embedding")
                 return None
 
-            payload = {
-                "text": text
-            }
+            key = self._cache_key(text)
+            cached = self._cache_get_many([key])
+            if key in cached:
+                self.cache_hits += 1
+                return cached[key]
 
-            response = requests.post(
-                f"{self.base_url}/{self.model}",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-
-            if response.status_code == 200:
-                result = response.json()
-                self.request_count += 1
-
-                # Extract embedding from response
-                if 'result' in result and 'data' in result['result']:
-                    embedding = result['result']['data'][0]
-                    return embedding
-                else:
-                    logger.error(f"Unexpected response format: {result}")
-                    return None
-            else:
-                logger.error(f"API error {response.status_code}: {response.text}")
-                return None
+            embeddings = self._post_embeddings([text])
+            if embeddings:
+                self._cache_put_many([(key, embeddings[0])])
+                return embeddings[0]
+            return None
 
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
@@ -97,7 +395,13 @@ class CloudflareEmbedder:
 
     def generate_embeddings_batch(self, texts: List[str]) -> List[Tuple[int, str, List[float]]]:
         """
-        Generate embeddings for multiple texts
+        Generate embeddings for multiple texts in batched API requests
+
+        Texts are sent MAX_TEXTS_PER_REQUEST at a time with up to
+        MAX_CONCURRENT_REQUESTS batches in flight, so a corpus of thousands
+        of chunks costs tens of overlapped HTTPS round trips instead of one
+        serial request per chunk. Rate limiting is handled by the session's
+        retry-with-backoff on 429 responses.
 
         Args:
             texts: List of text strings
@@ -105,54 +409,195 @@ class CloudflareEmbedder:
         Returns:
             list: List of (index, text, embedding) tuples - preserves original index for sync
         """
-        results = []
+        indexed_texts = []
         for i, text in enumerate(texts):
-            embedding = self.generate_embedding(text)
-            if embedding:
-                results.append((i, text, embedding))  # Include original index for metadata sync
-                if (i + 1) % 10 == 0:
-                    logger.info(f"Generated {i + 1}/{len(texts)} embeddings")
-                time.sleep(0.1)  # Rate limiting
+            text = text.strip() if text else ''
+            if text:
+                indexed_texts.append((i, text))
             else:
-                logger.warning(f"Failed to generate embedding for chunk {i} (skipping to prevent metadata misalignment)")
+                logger.warning(f"Empty text for chunk {i} (skipping)")
 
+        # Serve unchanged chunks from the on-disk cache; only misses go
+        # over the network
+        cached = self._cache_get_many([self._cache_key(text) for _, text in indexed_texts])
+        results = []
+        misses = []
+        for i, text in indexed_texts:
+            key = self._cache_key(text)
+            embedding = cached.get(key)
+            if embedding is not None:
+                results.append((i, text, embedding))
+            else:
+                misses.append((i, text, key))
+        if results:
+            self.cache_hits += len(results)
+            logger.info(f"Embedding cache: {len(results)} hits, {len(misses)} misses")
+
+        # Length-sorted batches: the backend pads each batch to its longest
+        # member, so grouping similar lengths avoids paying one long chunk's
+        # padding across an otherwise short batch. The final sort by index
+        # below restores the original order
+        misses.sort(key=lambda item: len(item[1]))
+
+        batches = [
+            misses[start:start + self.MAX_TEXTS_PER_REQUEST]
+            for start in range(0, len(misses), self.MAX_TEXTS_PER_REQUEST)
+        ]
+
+        def embed_batch(batch):
+            try:
+                return self._post_embeddings_hedged([text for _, text, _ in batch])
+            except Exception as e:
+                logger.error(f"Error generating embeddings for batch at chunk {batch[0][0]}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENT_REQUESTS) as executor:
+            # executor.map yields in submission order; cache writes stay on
+            # this thread so the sqlite connection is never shared
+            for batch, embeddings in zip(batches, executor.map(embed_batch, batches)):
+                if embeddings and len(embeddings) == len(batch):
+                    # Zip embeddings back with their original indices for metadata sync
+                    results.extend((i, text, embedding) for (i, text, _), embedding in zip(batch, embeddings))
+                    self._cache_put_many([(key, embedding) for (_, _, key), embedding in zip(batch, embeddings)])
+                else:
+                    # One bad input can fail a whole multi-text request;
+                    # retry this sub-batch per text so the rest survive
+                    logger.warning(f"Batch of {len(batch)} chunks at index {batch[0][0]} failed; retrying per text")
+                    for i, text, key in batch:
+                        try:
+                            single = self._post_embeddings([text])
+                        except Exception as e:
+                            logger.error(f"Error embedding chunk {i}: {e}")
+                            single = None
+                        if single:
+                            results.append((i, text, single[0]))
+                            self._cache_put_many([(key, single[0])])
+                        else:
+                            logger.warning(f"Failed to generate embedding for chunk {i} (skipping to prevent metadata misalignment)")
+                logger.info(f"Generated {len(results)}/{len(texts)} embeddings")
+
+        # Cache hits arrive out of order relative to API results
+        results.sort(key=lambda item: item[0])
         return results
 
 
 class TextChunker:
-    """Split text into overlapping chunks"""
+    """Split text into overlapping chunks at natural boundaries"""
+
+    # Tried in order: paragraph, line, sentence, word. Raw index slicing cut
+    # mid-word/mid-sentence, which degrades retrieval quality and wastes
+    # embedding calls on malformed chunks
+    SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+    MIN_CHUNK_CHARS = 50  # Skip very small chunks
 
     def __init__(self, chunk_size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+        # An overlap at or above the chunk size would re-carry the whole
+        # previous chunk forever; fail loudly at construction instead of
+        # emitting degenerate chunks deep in the pipeline
+        if not 0 <= overlap < chunk_size:
+            raise ValueError(f"overlap ({overlap}) must satisfy 0 <= overlap < chunk_size ({chunk_size})")
         self.chunk_size = chunk_size
         self.overlap = overlap
+        self._encoding = tiktoken.get_encoding('cl100k_base') if TIKTOKEN_AVAILABLE else None
+
+    def _length(self, text: str) -> int:
+        """Chunk-budget length of text: tokens with tiktoken, else characters"""
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return len(text)
+
+    def _split_pieces(self, text: str, separators=SEPARATORS) -> List[str]:
+        """
+        Recursively split text into pieces that each fit the chunk budget
+
+        Splits on the coarsest separator present, then re-splits any piece
+        still over budget with the finer separators.
+        """
+        if self._length(text) <= self.chunk_size:
+            return [text]
+        if not separators:
+            # No separator left (e.g. long runs without spaces): hard split
+            step = self.chunk_size if self._encoding is None else self.chunk_size * 4
+            return [text[i:i + step] for i in range(0, len(text), step)]
+
+        sep, finer = separators[0], separators[1:]
+        if sep not in text:
+            return self._split_pieces(text, finer)
+
+        pieces = []
+        parts = text.split(sep)
+        last = len(parts) - 1
+        for idx, part in enumerate(parts):
+            if idx < last:
+                part += sep  # Keep the boundary with the preceding piece
+            if not part:
+                continue
+            if self._length(part) <= self.chunk_size:
+                pieces.append(part)
+            else:
+                pieces.extend(self._split_pieces(part, finer))
+        return pieces
 
     def chunk_text(self, text: str, metadata: Dict = None) -> List[Dict]:
         """
         Split text into chunks with overlap
 
+        Pieces split at paragraph/sentence boundaries are merged greedily up
+        to chunk_size (tokens when tiktoken is installed, else characters);
+        each new chunk is seeded with the previous chunk's trailing pieces
+        up to the overlap budget.
+
         Args:
             text: Input text to chunk
             metadata: Additional metadata for chunks
 
         Returns:
-            list: List of {text, metadata, chunk_index} dicts
+            list: List of {text, base_meta, chunk_index, chunk_size,
+            text_preview} dicts; base_meta is one shared dict per call
+            and must be treated as immutable
         """
         chunks = []
-        step = self.chunk_size - self.overlap
-
-        for i in range(0, len(text), step):
-            chunk = text[i:i + self.chunk_size]
-            if len(chunk.strip()) > 50:  # Skip very small chunks
-                chunk_metadata = metadata.copy() if metadata else {}
-                chunk_metadata['chunk_index'] = len(chunks)
-                chunk_metadata['chunk_size'] = len(chunk)
-
+        current = []  # Pieces of the chunk under construction
+        current_len = 0
+        # One shared dict for every chunk of this document; the full
+        # per-vector metadata is materialized only at upsert time
+        base_meta = dict(metadata) if metadata else {}
+
+        def emit():
+            chunk = ''.join(current)
+            if len(chunk.strip()) > self.MIN_CHUNK_CHARS:
                 chunks.append({
                     'text': chunk,
-                    'metadata': chunk_metadata,
-                    'chunk_index': len(chunks)
+                    'base_meta': base_meta,
+                    'chunk_index': len(chunks),
+                    'chunk_size': len(chunk),
+                    # Preview truncated once at creation; the upsert
+                    # loop stores this instead of re-slicing per vector
+                    'text_preview': chunk[:500]
                 })
 
+        for piece in self._split_pieces(text):
+            piece_len = self._length(piece)
+            if current and current_len + piece_len > self.chunk_size:
+                emit()
+                # Seed the next chunk with trailing pieces up to the overlap
+                tail = []
+                tail_len = 0
+                for prev in reversed(current):
+                    prev_len = self._length(prev)
+                    if tail_len + prev_len > self.overlap:
+                        break
+                    tail.append(prev)
+                    tail_len += prev_len
+                tail.reverse()
+                current, current_len = tail, tail_len
+            current.append(piece)
+            current_len += piece_len
+
+        if current:
+            emit()
+
         return chunks
 
 
@@ -187,46 +632,110 @@ class PineconeIndexManager:
                 logger.info("Index created successfully")
                 time.sleep(5)  # Wait for index to be ready
 
-            self.index = self.pc.Index(self.index_name)
+            # Thread-pooled index: async_req upserts run concurrently
+            # through the SDK's own pool
+            self.index = self.pc.Index(self.index_name, pool_threads=self.POOL_THREADS)
             logger.info(f"Connected to index '{self.index_name}'")
 
         except Exception as e:
             logger.error(f"Error managing index: {e}")
             raise
 
-    def upsert_vectors(self, vectors: List[Tuple[str, List[float], Dict]], batch_size=BATCH_SIZE, namespace=None):
+    # SDK-side thread pool serving async_req upserts; its bound is the
+    # natural backpressure, so no artificial sleeps between batches
+    POOL_THREADS = 30
+
+    # Retries per batch with exponential backoff on transient errors
+    UPSERT_RETRIES = 3
+
+    @staticmethod
+    def _format_batch(batch):
+        """Format (id, embedding, metadata) tuples for the upsert API"""
+        return [
+            {
+                'id': vec_id,
+                'values': _vector_to_list(embedding),
+                'metadata': metadata
+            }
+            for vec_id, embedding, metadata in batch
+        ]
+
+    def _upsert_batch(self, batch, namespace=None):
+        """Upsert one batch, backing off exponentially on transient errors"""
+        upsert_data = self._format_batch(batch)
+
+        delay = 1.0
+        for attempt in range(self.UPSERT_RETRIES + 1):
+            try:
+                if namespace:
+                    self.index.upsert(vectors=upsert_data, namespace=namespace)
+                else:
+                    self.index.upsert(vectors=upsert_data)
+                return len(batch)
+            except Exception as e:
+                if attempt == self.UPSERT_RETRIES:
+                    raise
+                logger.warning(f"Upsert batch failed ({e}), retrying in {delay:.0f}s")
+                time.sleep(delay)
+                delay *= 2
+
+    # Target request size; Pinecone rejects payloads over 2 MB, so leave
+    # headroom for the JSON envelope
+    PAYLOAD_BUDGET_BYTES = 1_800_000
+
+    def _dynamic_batch_size(self, vectors) -> int:
+        """
+        Size batches by payload bytes rather than a fixed vector count
+
+        Estimates the serialized footprint of one vector from the first
+        entry's metadata (~12 bytes per embedding value as JSON text) and
+        fits as many vectors as the payload budget allows, capped at the
+        API's 1000-vector limit.
+        """
+        _, _, sample_meta = vectors[0]
+        per_vec = EMBEDDING_DIMENSION * 12 + 64
+        per_vec += sum(len(str(k)) + len(str(v)) for k, v in sample_meta.items())
+        return min(1000, max(64, self.PAYLOAD_BUDGET_BYTES // per_vec))
+
+    def upsert_vectors(self, vectors: List[Tuple[str, List[float], Dict]], batch_size=None, namespace=None):
         """
-        Upload vectors to Pinecone index
+        Upload vectors to Pinecone index in concurrent batches
+
+        All batches are dispatched with async_req=True through the index's
+        thread pool, keeping many upserts in flight; a batch whose future
+        fails is retried synchronously with backoff.
 
         Args:
             vectors: List of (id, embedding, metadata) tuples
-            batch_size: Batch size for upsert
+            batch_size: Batch size for upsert (default: sized to the
+                payload budget)
             namespace: Optional namespace for vector isolation (None = default namespace)
         """
+        if not vectors:
+            return
         try:
+            if batch_size is None:
+                batch_size = self._dynamic_batch_size(vectors)
+            batches = [vectors[i:i + batch_size] for i in range(0, len(vectors), batch_size)]
             total_upserted = 0
 
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-
-                # Format for Pinecone
-                upsert_data = [
-                    {
-                        'id': vec_id,
-                        'values': embedding,
-                        'metadata': metadata
-                    }
-                    for vec_id, embedding, metadata in batch
-                ]
-
+            in_flight = []
+            for batch in batches:
+                upsert_data = self._format_batch(batch)
                 if namespace:
-                    self.index.upsert(vectors=upsert_data, namespace=namespace)
+                    future = self.index.upsert(vectors=upsert_data, namespace=namespace, async_req=True)
                 else:
-                    self.index.upsert(vectors=upsert_data)
-
+                    future = self.index.upsert(vectors=upsert_data, async_req=True)
+                in_flight.append((batch, future))
+
+            for batch, future in in_flight:
+                try:
+                    future.get()
+                except Exception as e:
+                    logger.warning(f"Async upsert failed ({e}); retrying batch with backoff")
+                    self._upsert_batch(batch, namespace=namespace)
                 total_upserted += len(batch)
                 logger.info(f"Upserted {total_upserted}/{len(vectors)} vectors to namespace '{namespace if namespace else 'default'}'")
-                time.sleep(0.5)  # Rate limiting
 
         except Exception as e:
             logger.error(f"Error upserting vectors: {e}")
@@ -245,6 +754,7 @@ class PineconeIndexManager:
             list: Search results with scores
         """
         try:
+            query_embedding = _vector_to_list(query_embedding)
             if namespace:
                 results = self.index.query(
                     vector=query_embedding,
@@ -272,6 +782,25 @@ class PineconeIndexManager:
             return None
 
 
+@lru_cache(maxsize=1)
+def get_shared_embedder() -> CloudflareEmbedder:
+    """
+    Process-wide CloudflareEmbedder
+
+    Callers that coexist in one process (search interface, test harness)
+    share the same HTTP session and embedding cache instead of each
+    opening their own. The instance lives for the process; don't close
+    it from any single consumer.
+    """
+    return CloudflareEmbedder()
+
+
+@lru_cache(maxsize=1)
+def get_shared_index_manager() -> PineconeIndexManager:
+    """Process-wide PineconeIndexManager sharing one index connection"""
+    return PineconeIndexManager()
+
+
 class EmbeddingPipeline:
     """Complete pipeline for extraction, chunking, embedding, and storage with namespace isolation"""
 
@@ -283,13 +812,17 @@ class EmbeddingPipeline:
         self.subject_mapping = self._load_subject_mapping()
         self.namespaces_created = set()
 
+    def close(self):
+        """Release the embedder's network and cache resources"""
+        self.embedder.close()
+
     def _load_subject_mapping(self) -> Dict:
         """Load subject mapping configuration"""
         try:
             mapping_file = Path(__file__).parent / 'subject_mapping.json'
             if mapping_file.exists():
-                with open(mapping_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                raw = mapping_file.read_bytes()
+                return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
             else:
                 logger.warning("subject_mapping.json not found, using namespace-less mode")
                 return None
@@ -297,6 +830,16 @@ class EmbeddingPipeline:
             logger.error(f"Error loading subject mapping: {e}")
             return None
 
+    # Lowercase + space->underscore in a single str.translate pass per
+    # field instead of chained .lower().replace() copies. Romanian
+    # uppercase diacritics (and their legacy cedilla forms) are mapped
+    # explicitly so namespaces keep matching what .lower() produced
+    _NS_TRANS = str.maketrans({
+        **{chr(c): chr(c + 32) for c in range(ord('A'), ord('Z') + 1)},
+        **dict(zip('ĂÂÎȘȚŞŢ', 'ăâîșțşţ')),
+        ' ': '_'
+    })
+
     def _calculate_namespace(self, metadata: Dict) -> str:
         """
         Calculate Pinecone namespace from metadata
@@ -310,49 +853,113 @@ class EmbeddingPipeline:
         Returns:
             str: Normalized namespace name or None
         """
-        school = metadata.get('school', '').lower().replace(' ', '_')
-        class_name = metadata.get('class', '').lower().replace(' ', '_')
-        subject = metadata.get('subject', '').lower().replace(' ', '_')
+        school = metadata.get('school') or ''
+        class_name = metadata.get('class') or ''
+        subject = metadata.get('subject') or ''
 
         if school and class_name and subject:
-            namespace = f"{school}_{class_name}_{subject}"
-            return namespace
+            trans = self._NS_TRANS
+            return f"{school.translate(trans)}_{class_name.translate(trans)}_{subject.translate(trans)}"
         else:
             logger.warning(f"Incomplete metadata for namespace calculation: {metadata}")
             return None
 
-    def load_extracted_texts(self, limit=None) -> List[Dict]:
-        """Load extracted PDF texts"""
-        extracted_files = list(self.extracted_dir.glob('**/*_extracted.json'))
+    # Processes decoding extracted JSON in parallel; decoding is CPU-bound
+    # and the GIL blocks thread-based speedup
+    LOAD_WORKERS = min(os.cpu_count() or 1, 8)
+
+    def iter_extracted_texts(self, limit=None):
+        """
+        Yield extracted PDF documents one at a time
+
+        Parsing fans out across a process pool (JSON decode is CPU-bound),
+        but only 2x LOAD_WORKERS tasks are ever in flight: each new path
+        is submitted as an earlier result is yielded. Decoding outpaces
+        the embedding loop downstream, so an eager map() would pile every
+        parsed document up in completed futures - this keeps resident
+        documents bounded by the window, not the corpus.
 
+        Yields:
+            dict: Parsed *_extracted.json content
+        """
+        extracted_files = self.extracted_dir.glob('**/*_extracted.json')
         if limit:
-            extracted_files = extracted_files[:limit]
+            extracted_files = itertools.islice(extracted_files, limit)
+        paths = (str(file_path) for file_path in extracted_files)
+
+        if self.LOAD_WORKERS > 1:
+            window = self.LOAD_WORKERS * 2
+            pending = deque()
+            with ProcessPoolExecutor(max_workers=self.LOAD_WORKERS) as executor:
+                for path in paths:
+                    pending.append(executor.submit(_parse_extracted_json, path))
+                    if len(pending) >= window:
+                        doc = pending.popleft().result()
+                        if doc is not None:
+                            yield doc
+                while pending:
+                    doc = pending.popleft().result()
+                    if doc is not None:
+                        yield doc
+        else:
+            for path in paths:
+                doc = _parse_extracted_json(path)
+                if doc is not None:
+                    yield doc
 
-        documents = []
-        for file_path in extracted_files:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    documents.append(data)
-            except Exception as e:
-                logger.error(f"Error loading {file_path}: {e}")
+    def load_extracted_texts(self, limit=None) -> List[Dict]:
+        """Load extracted PDF texts (materialized; prefer iter_extracted_texts)"""
+        return list(self.iter_extracted_texts(limit=limit))
 
-        return documents
+    # Chunks buffered per embedding pass: enough to keep the embedder's
+    # concurrent batched requests fully loaded, small enough that memory
+    # stays O(batch) rather than O(corpus)
+    EMBED_BUFFER_SIZE = (CloudflareEmbedder.MAX_TEXTS_PER_REQUEST
+                         * CloudflareEmbedder.MAX_CONCURRENT_REQUESTS)
 
     def process_pipeline(self, limit=None):
-        """Run complete pipeline with namespace-based isolation"""
-        logger.info("Starting embedding pipeline with namespace isolation...")
+        """
+        Run complete pipeline with namespace-based isolation
 
-        # Load extracted texts
-        documents = self.load_extracted_texts(limit=limit)
-        logger.info(f"Loaded {len(documents)} documents")
+        Documents stream through load → chunk → embed → upsert one buffer
+        at a time; only counters survive between buffers, so the corpus
+        size no longer bounds memory. Upserts run on a separate thread fed
+        by a bounded queue, so Pinecone writes for one buffer overlap the
+        embedding of the next instead of alternating with it.
+        """
+        logger.info("Starting embedding pipeline with namespace isolation...")
 
-        # Chunk texts - include subject metadata for namespace calculation
-        all_chunks = []
-        for doc in documents:
-            chunks = self.chunker.chunk_text(
-                doc['text'],
-                metadata={
+        counts = {'documents': 0, 'chunks': 0, 'embeddings': 0, 'stored': 0}
+        vectors_per_namespace = {}
+        vectors_in_default = 0
+
+        # (namespace, vectors) groups awaiting upsert; the small bound
+        # keeps at most a couple of buffers of vectors in memory
+        upsert_q = queue.Queue(maxsize=4)
+        upsert_errors = []
+
+        def upsert_worker():
+            while True:
+                item = upsert_q.get()
+                if item is None:
+                    break
+                group_namespace, vectors = item
+                try:
+                    self.pinecone_manager.upsert_vectors(vectors, namespace=group_namespace)
+                except Exception as e:
+                    upsert_errors.append(e)
+
+        upsert_thread = threading.Thread(target=upsert_worker, daemon=True)
+        upsert_thread.start()
+
+        # source_file digests reused by every chunk of the same document
+        source_digests = {}
+
+        def iter_chunks():
+            # Chunk texts - include subject metadata for namespace calculation
+            for doc in self.iter_extracted_texts(limit=limit):
+                counts['documents'] += 1
+                doc_meta = {
                     'source_file': doc['metadata']['source_file'],
                     'source_path': doc['metadata'].get('source_path', ''),
                     'total_pages': doc['pages'],
@@ -360,72 +967,101 @@ class EmbeddingPipeline:
                     'class': doc['metadata'].get('class'),
                     'subject': doc['metadata'].get('subject')
                 }
-            )
-            all_chunks.extend(chunks)
-
-        logger.info(f"Created {len(all_chunks)} text chunks")
-
-        # Generate embeddings (returns tuples with original indices for metadata sync)
-        texts_to_embed = [chunk['text'] for chunk in all_chunks]
-        text_embeddings = self.embedder.generate_embeddings_batch(texts_to_embed)
-
-        logger.info(f"Generated {len(text_embeddings)} embeddings")
-
-        # Prepare vectors grouped by namespace
-        # IMPORTANT: Using returned indices ensures metadata stays synced even if some embeddings fail
-        vectors_by_namespace = {}
-        vectors_without_namespace = []
-
-        for chunk_idx, text, embedding in text_embeddings:
-            chunk_data = all_chunks[chunk_idx]  # Use returned index to access correct metadata
-
-            # Generate deterministic ID from source file + chunk index
-            # This prevents duplicate vectors when re-running the pipeline
-            source_file = chunk_data['metadata'].get('source_file', 'unknown')
-            id_hash = hashlib.md5(f"{source_file}_{chunk_idx}".encode()).hexdigest()[:12]
-            vector_id = f"vec_{id_hash}"
-
-            vector_metadata = {
-                'text': text[:500],  # Store first 500 chars
-                **chunk_data['metadata']
-            }
+                # Namespace depends only on document metadata: compute it
+                # once per document, not once per chunk; interning makes
+                # the grouping dict key compare by pointer
+                namespace = self._calculate_namespace(doc_meta)
+                if namespace:
+                    namespace = sys.intern(namespace)
+                chunks = self.chunker.chunk_text(doc['text'], metadata=doc_meta)
+                counts['chunks'] += len(chunks)
+                for chunk in chunks:
+                    chunk['namespace'] = namespace
+                    yield chunk
+
+        chunk_iter = iter_chunks()
+        while True:
+            buffered_chunks = list(itertools.islice(chunk_iter, self.EMBED_BUFFER_SIZE))
+            if not buffered_chunks:
+                break
+
+            # Generate embeddings (returns tuples with original indices for metadata sync)
+            texts_to_embed = [chunk['text'] for chunk in buffered_chunks]
+            text_embeddings = self.embedder.generate_embeddings_batch(texts_to_embed)
+            counts['embeddings'] += len(text_embeddings)
+
+            # Prepare vectors grouped by namespace
+            # IMPORTANT: Using returned indices ensures metadata stays synced even if some embeddings fail
+            vectors_by_namespace = defaultdict(list)
+            vectors_without_namespace = []
+
+            for buffer_idx, text, embedding in text_embeddings:
+                chunk_data = buffered_chunks[buffer_idx]  # Use returned index to access correct metadata
+
+                # Generate deterministic ID from source path + per-document
+                # chunk index - stable across runs and corpus orderings, so
+                # re-running the pipeline overwrites instead of duplicating.
+                # The path (not the bare name) keeps same-named PDFs from
+                # different subfolders from colliding in one namespace
+                base_meta = chunk_data['base_meta']
+                source_key = base_meta.get('source_path') or base_meta.get('source_file', 'unknown')
+                chunk_index = chunk_data['chunk_index']
+                digest = source_digests.get(source_key)
+                if digest is None:
+                    digest = source_digests[source_key] = _source_digest(source_key)
+                vector_id = _vector_id(digest, chunk_index)
+
+                # Only materialization point: buffered chunks share their
+                # document's base_meta and just carry the per-chunk fields
+                vector_metadata = {
+                    **base_meta,
+                    'chunk_index': chunk_index,
+                    'chunk_size': chunk_data['chunk_size'],
+                    'text': chunk_data['text_preview']
+                }
 
-            # Calculate namespace from metadata
-            namespace = self._calculate_namespace(chunk_data['metadata'])
+                # Namespace was computed once per document in iter_chunks
+                namespace = chunk_data['namespace']
 
-            if namespace:
-                if namespace not in vectors_by_namespace:
-                    vectors_by_namespace[namespace] = []
-                vectors_by_namespace[namespace].append((vector_id, embedding, vector_metadata))
-            else:
-                # Fallback: store in default namespace
-                vectors_without_namespace.append((vector_id, embedding, vector_metadata))
-
-        # Upsert vectors to their respective namespaces
-        total_stored = 0
-        for namespace, vectors in vectors_by_namespace.items():
-            logger.info(f"Upserting {len(vectors)} vectors to namespace '{namespace}'")
-            self.pinecone_manager.upsert_vectors(vectors, namespace=namespace)
-            self.namespaces_created.add(namespace)
-            total_stored += len(vectors)
-
-        # Upsert vectors without namespace to default namespace
-        if vectors_without_namespace:
-            logger.info(f"Upserting {len(vectors_without_namespace)} vectors to default namespace (incomplete metadata)")
-            self.pinecone_manager.upsert_vectors(vectors_without_namespace)
-            total_stored += len(vectors_without_namespace)
+                if namespace:
+                    vectors_by_namespace[namespace].append((vector_id, embedding, vector_metadata))
+                else:
+                    # Fallback: store in default namespace
+                    vectors_without_namespace.append((vector_id, embedding, vector_metadata))
+
+            # Hand this buffer to the upsert thread and go embed the next
+            for namespace, vectors in vectors_by_namespace.items():
+                logger.info(f"Queueing {len(vectors)} vectors for namespace '{namespace}'")
+                upsert_q.put((namespace, vectors))
+                self.namespaces_created.add(namespace)
+                vectors_per_namespace[namespace] = vectors_per_namespace.get(namespace, 0) + len(vectors)
+                counts['stored'] += len(vectors)
+
+            if vectors_without_namespace:
+                logger.info(f"Queueing {len(vectors_without_namespace)} vectors for default namespace (incomplete metadata)")
+                upsert_q.put((None, vectors_without_namespace))
+                vectors_in_default += len(vectors_without_namespace)
+                counts['stored'] += len(vectors_without_namespace)
+
+        upsert_q.put(None)
+        upsert_thread.join()
+        if upsert_errors:
+            raise upsert_errors[0]
+
+        logger.info(f"Loaded {counts['documents']} documents, "
+                    f"{counts['chunks']} chunks, {counts['embeddings']} embeddings")
 
         # Get stats
         stats = self.pinecone_manager.get_index_stats()
 
         summary = {
-            'documents_processed': len(documents),
-            'chunks_created': len(all_chunks),
-            'embeddings_generated': len(text_embeddings),
-            'vectors_stored': total_stored,
+            'documents_processed': counts['documents'],
+            'chunks_created': counts['chunks'],
+            'embeddings_generated': counts['embeddings'],
+            'vectors_stored': counts['stored'],
             'namespaces_created': sorted(list(self.namespaces_created)),
-            'vectors_in_namespaces': {ns: len(vecs) for ns, vecs in vectors_by_namespace.items()},
-            'vectors_in_default': len(vectors_without_namespace),
+            'vectors_in_namespaces': vectors_per_namespace,
+            'vectors_in_default': vectors_in_default,
             'index_stats': stats,
             'cloudflare_requests': self.embedder.request_count
         }
@@ -435,6 +1071,7 @@ class EmbeddingPipeline:
 
 def main():
     """Main entry point"""
+    pipeline = None
     try:
         pipeline = EmbeddingPipeline()
         summary = pipeline.process_pipeline(limit=None)
@@ -459,6 +1096,9 @@ def main():
     except Exception as e:
         logger.error(f"Pipeline failed: {e}")
         raise
+    finally:
+        if pipeline is not None:
+            pipeline.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,1055 @@
+"""
+Extract text content from PDF files
+Core PDFExtractor implementation; extract_pdfs.py provides the CLI
+"""
+
+import os
+import json
+import logging
+import io
+import itertools
+import mmap
+import queue
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from PyPDF2 import PdfReader
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from config import PDF_SOURCE_DIR, EXTRACTED_TEXT_DIR, LOG_LEVEL, TRACK_EXTRACTED_HASH
+
+# PyMuPDF (fitz) is ~5-10x faster than PyPDF2's pure-Python parser
+# Fall back to PyPDF2 if it's not installed or a document fails to open
+try:
+    import fitz  # PyMuPDF
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    fitz = None
+    PYMUPDF_AVAILABLE = False
+
+# poppler's pdftotext binary runs the whole parse in optimized C; used
+# as a fast path when PyMuPDF is unavailable, ahead of PyPDF2
+PDFTOTEXT_AVAILABLE = shutil.which('pdftotext') is not None
+
+# orjson serializes to UTF-8 bytes in C, typically 3-10x faster than
+# stdlib json for text-heavy payloads; fall back to stdlib if missing
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# xxHash (xxh3) is a non-cryptographic hash several times faster than MD5;
+# the hashes here only detect file changes, so crypto strength is not needed
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    xxhash = None
+    XXHASH_AVAILABLE = False
+
+_CHANGE_HASH_ALGO = 'xxh3_128' if XXHASH_AVAILABLE else 'md5'
+
+
+def _new_change_hasher():
+    """Create a hasher for change detection (xxh3 when available, else MD5)"""
+    return xxhash.xxh3_128() if XXHASH_AVAILABLE else hashlib.md5()
+
+
+def _serialize_json(obj, pretty=False):
+    """
+    Serialize obj to UTF-8 JSON bytes fully in memory
+
+    Compact by default: indentation roughly doubles file size and write
+    time on the manifest and extracted-text JSON for no programmatic
+    benefit. Pass pretty=True (CLI --pretty) for human inspection.
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    # json.dump would drive many small codec writes through a text-mode
+    # file; one bytes payload does not
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _write_bytes_atomic(path, buf):
+    """
+    Write buf to path via a sibling temp file and rename
+
+    The payload lands in one syscall and a worker dying mid-write can't
+    leave a torn JSON behind.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(buf)
+    os.replace(tmp_path, path)
+
+
+def _dump_json(obj, path, pretty=False):
+    """Write obj as UTF-8 JSON to path in a single buffered write"""
+    _write_bytes_atomic(path, _serialize_json(obj, pretty=pretty))
+
+# Setup logging
+logging.basicConfig(
+    level=LOG_LEVEL,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def _iter_pdfs(root):
+    """
+    Yield string paths of all PDF files under root using os.scandir
+
+    Path.rglob('*.pdf') builds a Path object and issues an lstat per
+    directory entry; scandir reuses the dirent data the OS already
+    returned, which is noticeably cheaper on 10k+ file trees. Path
+    objects are constructed later, only for files that get processed.
+    """
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.name.lower().endswith('.pdf'):
+                        yield entry.path
+        except OSError as e:
+            logger.warning(f"Cannot scan directory {current}: {e}")
+
+
+class PDFExtractor:
+    """Extract text from PDF files with incremental processing"""
+
+    MANIFEST_FILE = ".extraction_manifest.json"
+    HASH_CACHE_FILE = ".hash_cache.json"
+
+    # Page-level parallelism (PyMuPDF backend only): documents larger than
+    # the threshold are split into page blocks extracted by a thread pool
+    PAGE_PARALLEL_THRESHOLD = 32
+    PAGES_PER_CHUNK = 16
+    PAGE_WORKERS = 4
+
+    # Scanned-document probe: sample up to 3 spread-out pages; if they
+    # yield fewer combined characters than this, skip the full parse
+    SCANNED_PROBE_MIN_CHARS = 40
+
+    def __init__(self, source_dir=PDF_SOURCE_DIR, output_dir=EXTRACTED_TEXT_DIR, slim_output=False,
+                 pretty_output=False, load_manifest=True):
+        self.source_dir = Path(source_dir)
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.extracted_files = []
+        self.manifest_path = self.output_dir / self.MANIFEST_FILE
+        # Worker processes skip the manifest: they never read or save it
+        # (the parent filters candidates and merges entries), and loading
+        # it would also run the migration rehash once per process
+        self.manifest = self.load_manifest() if load_manifest else self._create_new_manifest()
+        self.hash_cache_path = self.output_dir / self.HASH_CACHE_FILE
+        self.hash_cache = self._load_hash_cache()
+        self.identified_subjects = set()
+        # Per-run caches: directories already created (saves a redundant
+        # mkdir syscall per file in shared folders) and the source prefix
+        # length for relative paths via string slicing, which skips
+        # Path.relative_to's per-component comparison loop
+        self._dirs_created = set()
+        self._source_prefix_len = len(str(self.source_dir)) + 1
+        # Slim mode drops the concatenated 'text' blob from output JSON
+        # (metadata/offsets only, roughly half the bytes). Not compatible
+        # with generate_embeddings.py, which consumes the full text.
+        self.slim_output = slim_output
+        # Pretty mode indents output JSON for human inspection; default is
+        # compact, which halves file size and serialization time
+        self.pretty_output = pretty_output
+
+    def parse_subject_from_path(self, pdf_path):
+        """
+        Extract school, class, and subject from PDF path hierarchy
+
+        Expected structure:
+        materiale_didactice/School/Class/Subject/document.pdf
+        e.g., materiale_didactice/Scoala_Normala/clasa_0/Matematica/file.pdf
+
+        Args:
+            pdf_path: Path object of the PDF file
+
+        Returns:
+            dict: {school: str, class: str, subject: str} or {school: None, class: None, subject: None}
+        """
+        try:
+            relative_path = pdf_path.relative_to(self.source_dir)
+            parts = relative_path.parts
+
+            # Expected structure: [school, class, subject, filename.pdf]
+            if len(parts) >= 3:
+                school = parts[0]
+                class_name = parts[1]
+                subject = parts[2]
+                return {
+                    'school': school,
+                    'class': class_name,
+                    'subject': subject
+                }
+            else:
+                logger.warning(f"PDF doesn't follow expected hierarchy: {relative_path}")
+                return {
+                    'school': None,
+                    'class': None,
+                    'subject': None
+                }
+        except Exception as e:
+            logger.error(f"Error parsing subject from path {pdf_path}: {e}")
+            return {
+                'school': None,
+                'class': None,
+                'subject': None
+            }
+
+    def _extract_pages(self, pdf_path, data=None):
+        """
+        Extract per-page text using the fastest available backend
+
+        Prefers PyMuPDF (C extension, ~5-10x faster) and falls back to
+        PyPDF2 when PyMuPDF is missing or fails to open the document.
+
+        Args:
+            pdf_path: Path to PDF file
+            data: optional PDF bytes already read by the caller, reused by
+                  the in-process backends to avoid a second disk pass
+
+        Returns:
+            tuple: (num_pages, page_nums, page_texts, pdf_meta, status)
+                   where page_nums is a list of 1-based page numbers that
+                   had text, page_texts is the parallel list of raw page
+                   strings, pdf_meta is a dict with 'title'/'author' keys
+                   (or None) and status is 'success' or 'likely_scanned'
+        """
+        if PYMUPDF_AVAILABLE:
+            try:
+                return self._extract_pages_pymupdf(pdf_path, data=data)
+            except Exception as e:
+                logger.warning(f"PyMuPDF failed for {pdf_path.name}: {e}. Trying next backend")
+        if PDFTOTEXT_AVAILABLE:
+            try:
+                # pdftotext reads from disk itself; the binary's speed
+                # outweighs the extra pass
+                return self._extract_pages_pdftotext(pdf_path)
+            except Exception as e:
+                logger.warning(f"pdftotext failed for {pdf_path.name}: {e}. Falling back to PyPDF2")
+        return self._extract_pages_pypdf2(pdf_path, data=data)
+
+    def _extract_pages_pymupdf(self, pdf_path, data=None):
+        """Extract pages with PyMuPDF (fitz)"""
+        if isinstance(data, (bytes, bytearray)):
+            doc = fitz.open(stream=data, filetype='pdf')
+        else:
+            # fitz wants real bytes; for mmapped input let it read the
+            # file itself (it parses lazily from disk anyway)
+            doc = fitz.open(str(pdf_path))
+        try:
+            num_pages = doc.page_count
+            pdf_meta = None
+            if doc.metadata:
+                pdf_meta = {
+                    'title': doc.metadata.get('title') or 'Unknown',
+                    'author': doc.metadata.get('author') or 'Unknown'
+                }
+
+            # Probe a few spread-out pages first: image-only (scanned)
+            # documents yield essentially no text, and skipping the full
+            # N-page loop saves nearly the whole parse cost for them
+            if num_pages and self._probe_looks_scanned(
+                lambda i: doc.load_page(i).get_text("text"), num_pages
+            ):
+                logger.info("%s looks scanned; skipping full extraction (route to OCR)", pdf_path.name)
+                return num_pages, [], [], pdf_meta, 'likely_scanned'
+
+            if num_pages > self.PAGE_PARALLEL_THRESHOLD:
+                page_results = self._extract_pages_parallel(pdf_path, num_pages)
+            else:
+                page_results = self._extract_page_range(pdf_path, 0, num_pages, doc=doc)
+        finally:
+            doc.close()
+
+        page_nums = []
+        page_texts = []
+        failed_pages = []
+        empty_pages = []
+        for page_num, text in page_results:
+            if text and text.strip():
+                page_nums.append(page_num + 1)
+                page_texts.append(text)
+            elif text is None:
+                failed_pages.append(page_num + 1)
+            elif not text:
+                empty_pages.append(page_num + 1)
+
+        # One aggregated log line per document instead of one per page:
+        # scanned/corrupt PDFs otherwise pay a formatted log call per page
+        if failed_pages:
+            logger.warning("Pages failed in %s: %s", pdf_path.name, failed_pages)
+        if empty_pages:
+            logger.debug("Pages without extractable text in %s (scanned?): %s", pdf_path.name, empty_pages)
+
+        return num_pages, page_nums, page_texts, pdf_meta, 'success'
+
+    def _probe_looks_scanned(self, get_page_text, num_pages):
+        """
+        Sample up to 3 spread-out pages and report True if they produce
+        almost no text (image-only document)
+
+        Args:
+            get_page_text: callable(page_index) -> str for the open document
+            num_pages: total page count
+        """
+        sample_len = 0
+        for page_num in sorted({0, num_pages // 2, num_pages - 1}):
+            try:
+                sample_len += len(get_page_text(page_num).strip())
+            except Exception:
+                continue
+            if sample_len >= self.SCANNED_PROBE_MIN_CHARS:
+                return False
+        return sample_len < self.SCANNED_PROBE_MIN_CHARS
+
+    def _extract_pages_pdftotext(self, pdf_path):
+        """
+        Extract pages by shelling out to poppler's pdftotext binary
+
+        The whole parse runs in optimized C; pages come back separated by
+        form-feed characters, preserving the per-page structure.
+        """
+        proc = subprocess.run(
+            ['pdftotext', '-layout', str(pdf_path), '-'],
+            capture_output=True,
+            timeout=120,
+            check=True
+        )
+        pages = proc.stdout.decode('utf-8', errors='replace').split('\f')
+        # pdftotext terminates the last page with a form-feed, leaving an
+        # empty tail segment
+        if pages and not pages[-1].strip():
+            pages.pop()
+        num_pages = len(pages)
+
+        page_nums = []
+        page_texts = []
+        empty_pages = []
+        for page_num, text in enumerate(pages, 1):
+            if text and text.strip():
+                page_nums.append(page_num)
+                page_texts.append(text)
+            else:
+                empty_pages.append(page_num)
+
+        if empty_pages:
+            logger.debug("Pages without extractable text in %s (scanned?): %s", pdf_path.name, empty_pages)
+
+        status = 'success' if page_texts or not num_pages else 'likely_scanned'
+        return num_pages, page_nums, page_texts, None, status
+
+    def _extract_page_range(self, pdf_path, start, end, doc=None):
+        """
+        Extract a block of pages as (page_index, text) tuples
+
+        Opens its own document unless one is supplied: MuPDF documents are
+        not safe to share across threads.
+        """
+        own_doc = doc is None
+        if own_doc:
+            doc = fitz.open(str(pdf_path))
+        try:
+            page_results = []
+            for page_num in range(start, end):
+                try:
+                    text = doc.load_page(page_num).get_text("text")
+                except Exception:
+                    # Failures are aggregated and logged once per document
+                    text = None
+                page_results.append((page_num, text))
+            return page_results
+        finally:
+            if own_doc:
+                doc.close()
+
+    def _extract_pages_parallel(self, pdf_path, num_pages):
+        """
+        Extract pages in blocks across a thread pool
+
+        PyMuPDF releases the GIL inside its C code, so threads scale for
+        large documents; small documents skip this to avoid pool overhead.
+        """
+        spans = [
+            (start, min(start + self.PAGES_PER_CHUNK, num_pages))
+            for start in range(0, num_pages, self.PAGES_PER_CHUNK)
+        ]
+        page_results = []
+        with ThreadPoolExecutor(max_workers=self.PAGE_WORKERS) as executor:
+            futures = [executor.submit(self._extract_page_range, pdf_path, start, end) for start, end in spans]
+            for future in futures:
+                page_results.extend(future.result())
+
+        # Restore page order (futures complete out of order)
+        page_results.sort(key=lambda item: item[0])
+        return page_results
+
+    def _extract_pages_pypdf2(self, pdf_path, data=None):
+        """Extract pages with PyPDF2 (fallback backend)"""
+        if data is None:
+            reader = PdfReader(pdf_path)
+        elif isinstance(data, (bytes, bytearray)):
+            reader = PdfReader(io.BytesIO(data))
+        else:
+            # File-like buffer (e.g. mmap): PyPDF2 seeks/reads lazily from
+            # it, so the file never has to be copied into RAM
+            data.seek(0)
+            reader = PdfReader(data)
+        num_pages = len(reader.pages)
+
+        pdf_meta = None
+        if reader.metadata:
+            pdf_meta = {
+                'title': reader.metadata.get('/Title', 'Unknown'),
+                'author': reader.metadata.get('/Author', 'Unknown')
+            }
+
+        if num_pages and self._probe_looks_scanned(
+            lambda i: reader.pages[i].extract_text() or '', num_pages
+        ):
+            logger.info("%s looks scanned; skipping full extraction (route to OCR)", pdf_path.name)
+            return num_pages, [], [], pdf_meta, 'likely_scanned'
+
+        page_nums = []
+        page_texts = []
+        failed_pages = []
+        empty_pages = []
+
+        for page_num, page in enumerate(reader.pages, 1):
+            try:
+                text = page.extract_text()
+                # Guard against None (e.g., scanned PDFs, corrupted pages)
+                if text and text.strip():
+                    page_nums.append(page_num)
+                    page_texts.append(text)
+                elif not text:
+                    empty_pages.append(page_num)
+            except Exception:
+                failed_pages.append(page_num)
+
+        # Aggregated, lazily-formatted logs (see PyMuPDF backend)
+        if failed_pages:
+            logger.warning("Pages failed in %s: %s", pdf_path.name, failed_pages)
+        if empty_pages:
+            logger.debug("Pages without extractable text in %s (scanned?): %s", pdf_path.name, empty_pages)
+
+        return num_pages, page_nums, page_texts, pdf_meta, 'success'
+
+    def extract_text_from_pdf(self, pdf_path, data=None):
+        """
+        Extract all text from a PDF file
+
+        Args:
+            pdf_path: Path to PDF file
+            data: optional PDF bytes already read by the caller (avoids a
+                  second read from disk)
+
+        Returns:
+            dict: {pages: int, text: str, metadata: dict, extraction_status: str}
+        """
+        try:
+            num_pages, page_nums, page_texts, pdf_meta, extraction_status = self._extract_pages(pdf_path, data=data)
+            error_log = None
+
+            # Combine all text: join the raw string list directly, no
+            # per-page dict lookups or temporary comprehension
+            full_text = "\n".join(page_texts)
+
+            # Per-page boundaries as (page_num, start, end) offsets into
+            # full_text: page text is never duplicated, so peak memory for
+            # the text body drops ~2x and callers can slice copy-free
+            page_offsets = []
+            cursor = 0
+            for page_num, text in zip(page_nums, page_texts):
+                end = cursor + len(text)
+                page_offsets.append((page_num, cursor, end))
+                cursor = end + 1  # account for the '\n' join separator
+
+            # Parse subject information from path hierarchy
+            subject_info = self.parse_subject_from_path(pdf_path)
+            if subject_info['subject']:
+                self.identified_subjects.add(subject_info['subject'])
+
+            result = {
+                'pages': num_pages,
+                'text': full_text,
+                'page_offsets': page_offsets,
+                'extraction_status': extraction_status,
+                'extracted_pages': len(page_nums),
+                'metadata': {
+                    'source_file': pdf_path.name,
+                    'source_path': str(pdf_path),
+                    'school': subject_info['school'],
+                    'class': subject_info['class'],
+                    'subject': subject_info['subject']
+                }
+            }
+
+            if pdf_meta:
+                result['metadata']['pdf_title'] = pdf_meta.get('title', 'Unknown')
+                result['metadata']['pdf_author'] = pdf_meta.get('author', 'Unknown')
+
+            logger.info("Extracted %d pages from %s [%s]", len(page_nums), pdf_path.name, extraction_status)
+            return result
+
+        except Exception as e:
+            logger.error(f"Error processing PDF {pdf_path}: {e}")
+            return None
+
+    def load_manifest(self):
+        """Load extraction manifest or create new one"""
+        if self.manifest_path.exists():
+            try:
+                raw = self.manifest_path.read_bytes()
+                manifest = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+                logger.info(f"Loaded manifest with {len(manifest.get('files', {}))} tracked files")
+                return self._migrate_manifest_hashes(manifest)
+            except Exception as e:
+                logger.warning(f"Error loading manifest: {e}. Creating new manifest.")
+                return self._create_new_manifest()
+        return self._create_new_manifest()
+
+    def _create_new_manifest(self):
+        """Create new manifest structure"""
+        return {
+            'extraction_version': '2.0',
+            'source_hash_algo': _CHANGE_HASH_ALGO,
+            'last_updated': datetime.now().isoformat(),
+            'files': {}
+        }
+
+    def _migrate_manifest_hashes(self, manifest):
+        """
+        One-shot rehash of tracked files after a hash-algorithm change
+
+        source_hash is an opaque string; when the algorithm recorded in the
+        manifest differs from the one in use (e.g. MD5 entries from before
+        xxh3, or xxhash newly installed), every stored hash would mismatch
+        and force a full re-extraction. Rehashing the source files here is
+        much cheaper than re-parsing them.
+        """
+        if manifest.get('source_hash_algo', 'md5') == _CHANGE_HASH_ALGO:
+            return manifest
+        migrated = 0
+        for relative_path, entry in manifest.get('files', {}).items():
+            pdf_path = self.source_dir / relative_path
+            if pdf_path.exists():
+                new_hash = self.calculate_file_hash(pdf_path)
+                if new_hash:
+                    entry['source_hash'] = new_hash
+                    migrated += 1
+        manifest['source_hash_algo'] = _CHANGE_HASH_ALGO
+        manifest['extraction_version'] = '2.0'
+        if migrated:
+            logger.info(f"Rehashed {migrated} manifest entries with {_CHANGE_HASH_ALGO}")
+        return manifest
+
+    def save_manifest(self):
+        """Save manifest to disk"""
+        self.manifest['last_updated'] = datetime.now().isoformat()
+        try:
+            _dump_json(self.manifest, self.manifest_path)
+            logger.info(f"Manifest saved with {len(self.manifest['files'])} files")
+        except Exception as e:
+            logger.error(f"Error saving manifest: {e}")
+
+    # Files below this size are hashed from one read_bytes call; larger
+    # ones stream through hashlib's C read loop
+    HASH_ONESHOT_MAX_BYTES = 32 << 20
+
+    def calculate_file_hash(self, pdf_path):
+        """
+        Calculate change-detection hash of PDF file (xxh3 when available)
+
+        4 KB read chunks made this mostly syscall overhead (~16k reads for
+        a 64 MB PDF); small files are now hashed from a single read and
+        large ones via hashlib.file_digest's optimized C loop.
+        """
+        try:
+            if pdf_path.stat().st_size <= self.HASH_ONESHOT_MAX_BYTES:
+                hasher = _new_change_hasher()
+                hasher.update(pdf_path.read_bytes())
+                return hasher.hexdigest()
+            with open(pdf_path, 'rb') as f:
+                if hasattr(hashlib, 'file_digest'):  # Python 3.11+
+                    return hashlib.file_digest(f, _new_change_hasher).hexdigest()
+                hasher = _new_change_hasher()
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    hasher.update(chunk)
+                return hasher.hexdigest()
+        except Exception as e:
+            logger.error(f"Error calculating hash for {pdf_path}: {e}")
+            return None
+
+    def should_process_file(self, pdf_path, force=False):
+        """Determine if file should be processed based on stat/hash comparison"""
+        if force:
+            return True, "Force reprocessing"
+
+        relative_path = str(pdf_path.relative_to(self.source_dir))
+        stored_info = self.manifest['files'].get(relative_path)
+        if stored_info is None:
+            return True, "New file"
+
+        # Fast path: unchanged (size, mtime_ns) means the file has not been
+        # touched since the last run, so there is nothing to hash
+        try:
+            st = pdf_path.stat()
+        except OSError as e:
+            logger.error(f"Error stating {pdf_path}: {e}")
+            return False, "Failed to stat file"
+        if (stored_info.get('stored_size') == st.st_size
+                and stored_info.get('stored_mtime_ns') == st.st_mtime_ns):
+            return False, "File unchanged (stat)"
+
+        current_hash = self.calculate_file_hash(pdf_path)
+        if not current_hash:
+            return False, "Failed to calculate file hash"
+
+        if stored_info.get('source_hash') != current_hash:
+            return True, "File modified (hash changed)"
+
+        # stat changed but the bytes did not (e.g. touch/copy); refresh the
+        # fingerprint so the next run takes the fast path again
+        stored_info['stored_size'] = st.st_size
+        stored_info['stored_mtime_ns'] = st.st_mtime_ns
+        return False, "File unchanged"
+
+    def extract_specific_folders(self, school_folders):
+        """
+        Extract from specific school folders
+
+        Args:
+            school_folders: list of folder names to process
+                          e.g., ['Scoala_de_Muzica_George_Enescu', 'Scoala_Normala']
+
+        Yields:
+            str: PDF paths, streamed as the folders are walked
+        """
+        for folder_name in school_folders:
+            folder_path = self.source_dir / folder_name
+            if not folder_path.exists():
+                logger.warning(f"Folder not found: {folder_path}")
+                continue
+
+            logger.info(f"Scanning {folder_name} for PDFs")
+            yield from _iter_pdfs(str(folder_path))
+
+    def _load_hash_cache(self):
+        """Load the content-hash dedupe cache ({sha256: output path})"""
+        if self.hash_cache_path.exists():
+            try:
+                raw = self.hash_cache_path.read_bytes()
+                return orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+            except Exception as e:
+                logger.warning(f"Error loading hash cache: {e}. Starting empty.")
+        return {}
+
+    def _save_hash_cache(self):
+        """Persist the content-hash dedupe cache"""
+        try:
+            _dump_json(self.hash_cache, self.hash_cache_path)
+        except Exception as e:
+            logger.error(f"Error saving hash cache: {e}")
+
+    def _load_cached_extraction(self, cached_path, pdf_path):
+        """
+        Seed a result from a previous extraction of identical PDF bytes
+
+        School corpora often contain the same PDF under several folders;
+        reusing the parsed text skips the whole parse cost. Path-derived
+        metadata is rebuilt for the new location.
+
+        Returns:
+            dict: result dict as extract_text_from_pdf would produce,
+                  or None if the cached JSON is unusable
+        """
+        try:
+            with open(cached_path, 'rb') as f:
+                raw = f.read()
+            data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+            if 'text' not in data:
+                return None  # slim-output entries can't seed a full result
+
+            subject_info = self.parse_subject_from_path(pdf_path)
+            if subject_info['subject']:
+                self.identified_subjects.add(subject_info['subject'])
+            data['metadata'].update({
+                'source_file': pdf_path.name,
+                'source_path': str(pdf_path),
+                'school': subject_info['school'],
+                'class': subject_info['class'],
+                'subject': subject_info['subject']
+            })
+            return data
+        except Exception as e:
+            logger.warning(f"Error reusing cached extraction {cached_path}: {e}")
+            return None
+
+    def _output_path_for(self, pdf_path):
+        """
+        Output JSON path for a source PDF, mirroring the folder structure
+
+        E.g., materiale_didactice/Folder1/sub/file.pdf →
+        extracted_texts/Folder1/sub/file_extracted.json (avoids filename
+        collisions between folders).
+        """
+        relative_path = self._relative_path_for(pdf_path)
+        return self.output_dir / relative_path.parent / f"{relative_path.stem}_extracted.json"
+
+    def _relative_path_for(self, pdf_path):
+        """Relative path under source_dir via prefix slicing (all pipeline
+        paths originate from source_dir, so no component comparison needed)"""
+        return Path(str(pdf_path)[self._source_prefix_len:])
+
+    def _process_single_pdf(self, pdf_path, enqueue_write=None):
+        """
+        Extract one PDF, write its JSON output, and build tracking entries
+
+        Safe to call from worker processes: touches only the filesystem,
+        never the shared manifest (the parent merges manifest entries).
+
+        Args:
+            pdf_path: Path to PDF file
+            enqueue_write: optional callable(output_path, bytes) that takes
+                           over the JSON write (used to hand writes to a
+                           dedicated writer thread)
+
+        Returns:
+            dict: {relative_path, summary_entry, manifest_entry, subject}
+                  or None if extraction failed
+        """
+        relative_path = self._relative_path_for(pdf_path)
+        output_path = self._output_path_for(pdf_path)
+
+        # Map the PDF instead of reading it whole: one buffer feeds the
+        # dedupe hash, the change-tracking hash and the parser, and the OS
+        # pages bytes in lazily rather than pinning the full file in RAM
+        try:
+            with open(pdf_path, 'rb') as f:
+                try:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except (ValueError, OSError):
+                    # Empty file or a filesystem without mmap support
+                    data = f.read()
+        except OSError as e:
+            logger.error(f"Error reading {pdf_path}: {e}")
+            return None
+
+        try:
+            content_hash = hashlib.sha256(data).hexdigest()
+            source_hasher = _new_change_hasher()
+            source_hasher.update(data)
+            source_hash = source_hasher.hexdigest()
+
+            # Content-hash dedupe: identical PDF bytes seen before short-circuit
+            # to the already-extracted JSON instead of re-parsing
+            result = None
+            if content_hash:
+                cached_output = self.hash_cache.get(content_hash)
+                if cached_output and cached_output != str(output_path) and Path(cached_output).exists():
+                    result = self._load_cached_extraction(Path(cached_output), pdf_path)
+                    if result:
+                        logger.info(f"Duplicate content: reusing extraction of {cached_output} for {pdf_path.name}")
+
+            if result is None:
+                result = self.extract_text_from_pdf(pdf_path, data=data)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+        if not result:
+            return None
+        if content_hash:
+            self.hash_cache[content_hash] = str(output_path)
+
+        # Record the source fingerprint so the up-to-date check can verify
+        # a future run without re-reading the PDF
+        source_stat = None
+        try:
+            source_stat = pdf_path.stat()
+            result['metadata']['source_size'] = source_stat.st_size
+            result['metadata']['source_mtime'] = source_stat.st_mtime
+        except OSError:
+            pass
+
+        # Most PDFs share a folder with earlier ones; only issue the mkdir
+        # syscall the first time each directory is seen
+        parent = output_path.parent
+        if parent not in self._dirs_created:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._dirs_created.add(parent)
+
+        if self.slim_output:
+            # Serialize without the concatenated text blob; keep the full
+            # result in memory for hashing/summary below
+            slim_result = {k: v for k, v in result.items() if k != 'text'}
+            buf = _serialize_json(slim_result, pretty=self.pretty_output)
+        else:
+            buf = _serialize_json(result, pretty=self.pretty_output)
+        if enqueue_write is not None:
+            enqueue_write(output_path, buf)
+        else:
+            _write_bytes_atomic(output_path, buf)
+
+        # Nothing reads this back for decisions, so the O(text) hashing
+        # pass is opt-in via TRACK_EXTRACTED_HASH
+        extracted_hash = None
+        if TRACK_EXTRACTED_HASH:
+            extracted_hasher = _new_change_hasher()
+            extracted_hasher.update(result['text'].encode())
+            extracted_hash = extracted_hasher.hexdigest()
+
+        summary_entry = {
+            'file': relative_path.name,
+            'path': str(relative_path),
+            'pages': result['pages'],
+            'extracted_pages': result['extracted_pages'],
+            'text_length': len(result['text']),
+            'output_file': str(output_path)
+        }
+        manifest_entry = {
+            'source_hash': source_hash,
+            'stored_size': source_stat.st_size if source_stat else None,
+            'stored_mtime_ns': source_stat.st_mtime_ns if source_stat else None,
+            'extracted_hash': extracted_hash,
+            'extracted_pages': result['extracted_pages'],
+            'total_pages': result['pages'],
+            'extraction_status': result.get('extraction_status', 'success'),
+            'school': result['metadata'].get('school'),
+            'class': result['metadata'].get('class'),
+            'subject': result['metadata'].get('subject'),
+            'timestamp': datetime.now().isoformat()
+        }
+
+        return {
+            'relative_path': str(relative_path),
+            'summary_entry': summary_entry,
+            'manifest_entry': manifest_entry,
+            'subject': result['metadata'].get('subject'),
+            'content_hash': content_hash
+        }
+
+    def extract_all(self, specific_folders=None, limit=None, incremental=False, force=False, workers=None,
+                    legacy_summary=False):
+        """
+        Extract text from all PDFs in source directory
+
+        Per-file summary entries are streamed to extraction_summary.jsonl
+        as each PDF finishes, so memory stays flat on large corpora and the
+        summary survives interrupted runs.
+
+        Args:
+            specific_folders: list of specific folder names to process
+                            if None, process all PDFs
+            limit: maximum number of PDFs to process
+            workers: number of worker processes (default: min(cpu_count, 8);
+                     1 disables multiprocessing)
+            legacy_summary: also write the aggregated extraction_summary.json
+                            (buffers all entries in memory)
+
+        Returns:
+            dict: {total_files: int, successful: int, failed: int, files: list}
+        """
+        # Discovery is streamed: workers start on the first PDF found
+        # instead of waiting for the whole tree walk, and --limit stops
+        # the walk early instead of trimming a materialized list
+        if specific_folders:
+            pdf_iter = self.extract_specific_folders(specific_folders)
+        else:
+            pdf_iter = _iter_pdfs(str(self.source_dir))
+
+        if limit:
+            pdf_iter = itertools.islice(pdf_iter, limit)
+
+        if incremental and not force:
+            logger.info("Running in incremental mode - checking for changes")
+        elif force:
+            logger.info("Force reprocessing all files")
+
+        # Counters fill in as the stream is consumed; totals are only
+        # known once processing finishes
+        counts = {'discovered': 0, 'skipped_unchanged': 0, 'skipped_up_to_date': 0}
+
+        def _iter_candidates():
+            for pdf_path_str in pdf_iter:
+                counts['discovered'] += 1
+                pdf_path = Path(pdf_path_str)
+
+                if incremental and not force:
+                    should_process, reason = self.should_process_file(pdf_path, force=force)
+                    if not should_process:
+                        counts['skipped_unchanged'] += 1
+                        continue
+
+                # Cheap mtime cache: skip PDFs whose extracted JSON is
+                # already newer than the source file. Costs one stat pair
+                # per file, so reruns are O(changed files). --force bypasses.
+                if not force:
+                    output_path = self._output_path_for(pdf_path)
+                    try:
+                        if output_path.exists() and output_path.stat().st_mtime >= pdf_path.stat().st_mtime:
+                            counts['skipped_up_to_date'] += 1
+                            continue
+                    except OSError:
+                        pass
+
+                yield pdf_path
+
+        successful = 0
+        failed = 0
+        no_text = 0
+        results = []
+
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 8)
+
+        # PDF parsing is CPU-bound, so processes (not threads) are needed
+        # to use multiple cores. Workers write their own output JSON; the
+        # parent merges manifest entries to keep manifest updates single-writer.
+        def _iter_outcomes():
+            candidates = _iter_candidates()
+            if workers > 1:
+                logger.info(f"Extracting with {workers} worker processes")
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_worker,
+                    initargs=(str(self.source_dir), str(self.output_dir), self.slim_output,
+                              self.pretty_output)
+                ) as executor:
+                    yield from executor.map(_process_one, (str(p) for p in candidates), chunksize=4)
+            else:
+                # Sequential path: a single writer thread flushes each JSON
+                # while the next file is being parsed, so disk and CPU
+                # overlap instead of alternating. Bounded queue caps memory;
+                # the single writer keeps filesystem access sequential.
+                write_queue = queue.Queue(maxsize=8)
+                write_errors = []
+
+                def _drain_writes():
+                    # Keep draining even after a failure: if this thread
+                    # died, the bounded queue would fill and the producer
+                    # (and the sentinel put below) would block forever.
+                    # Failures are re-raised after join instead.
+                    while True:
+                        item = write_queue.get()
+                        if item is None:
+                            break
+                        out_path, buf = item
+                        try:
+                            _write_bytes_atomic(out_path, buf)
+                        except Exception as e:
+                            logger.error(f"Error writing {out_path}: {e}")
+                            write_errors.append(e)
+
+                writer_thread = threading.Thread(target=_drain_writes, name='json-writer', daemon=True)
+                writer_thread.start()
+                try:
+                    for pdf_path in candidates:
+                        yield self._process_single_pdf(
+                            pdf_path,
+                            enqueue_write=lambda out_path, buf: write_queue.put((out_path, buf))
+                        )
+                finally:
+                    write_queue.put(None)  # Sentinel: flush and stop the writer
+                    writer_thread.join()
+                    # Outcomes are recorded before their JSON hits disk, so
+                    # a swallowed write failure would be reported as success
+                    if write_errors:
+                        raise write_errors[0]
+
+        # Stream one JSON line per finished file instead of buffering the
+        # whole results list: memory stays O(1) in corpus size and the
+        # summary is usable even when a run is interrupted
+        summary_jsonl_path = self.output_dir / 'extraction_summary.jsonl'
+        with open(summary_jsonl_path, 'wb') as summary_stream:
+            for outcome in _iter_outcomes():
+                if outcome:
+                    successful += 1
+                    entry = outcome['summary_entry']
+                    if ORJSON_AVAILABLE:
+                        summary_stream.write(orjson.dumps(entry) + b'\n')
+                    else:
+                        summary_stream.write(json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n')
+                    if legacy_summary:
+                        results.append(entry)
+                    self.manifest['files'][outcome['relative_path']] = outcome['manifest_entry']
+                    if outcome['subject']:
+                        self.identified_subjects.add(outcome['subject'])
+                    # Merge worker-side hashes so the dedupe cache persists
+                    if outcome.get('content_hash'):
+                        self.hash_cache[outcome['content_hash']] = entry['output_file']
+                else:
+                    failed += 1
+
+        # Deterministic summary ordering regardless of worker scheduling
+        results.sort(key=lambda entry: entry['path'])
+
+        if counts['skipped_unchanged'] or counts['skipped_up_to_date']:
+            logger.info(
+                f"Skipped {counts['skipped_unchanged']} unchanged and "
+                f"{counts['skipped_up_to_date']} up-to-date files"
+            )
+        logger.info(f"Discovered {counts['discovered']} PDF files")
+
+        summary = {
+            'total_files': counts['discovered'],
+            'successful': successful,
+            'failed': failed,
+            'skipped': counts['skipped_unchanged'] + counts['skipped_up_to_date'],
+            'identified_subjects': sorted(list(self.identified_subjects)),
+            'output_directory': str(self.output_dir),
+            'summary_stream': str(summary_jsonl_path),
+            'files': results
+        }
+
+        # Aggregated summary is opt-in: it buffers every entry in memory,
+        # which the streamed .jsonl exists to avoid
+        if legacy_summary:
+            summary_path = self.output_dir / 'extraction_summary.json'
+            _dump_json(summary, summary_path, pretty=self.pretty_output)
+            logger.info(f"Summary saved to {summary_path}")
+
+        # Save manifest and dedupe cache
+        self.save_manifest()
+        self._save_hash_cache()
+
+        logger.info(f"Extraction complete: {successful} successful, {failed} failed")
+        logger.info(f"Summary streamed to {summary_jsonl_path}")
+        logger.info(f"Manifest saved to {self.manifest_path}")
+
+        return summary
+
+
+# Per-process extractor for ProcessPoolExecutor workers: built once per
+# worker via the initializer so each task pickles only the PDF path
+_worker_extractor = None
+
+
+def _init_worker(source_dir, output_dir, slim_output=False, pretty_output=False):
+    """Initialize the per-process PDFExtractor for worker processes"""
+    global _worker_extractor
+    _worker_extractor = PDFExtractor(source_dir=source_dir, output_dir=output_dir,
+                                     slim_output=slim_output, pretty_output=pretty_output,
+                                     load_manifest=False)
+
+
+def _process_one(pdf_path_str):
+    """Process a single PDF inside a worker process (module-level, picklable)"""
+    return _worker_extractor._process_single_pdf(Path(pdf_path_str))
@@ -6,17 +6,41 @@ Supports both explicit subject selection and auto-routing based on query keyword
 import json
 import logging
 import argparse
+import heapq
+import itertools
+import pickle
+import string
 import sys
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Dict, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    ahocorasick = None
+    AHOCORASICK_AVAILABLE = False
+
 from config import (
     CLOUDFLARE_API_TOKEN,
     CLOUDFLARE_ACCOUNT_ID,
     PINECONE_API_KEY,
     PINECONE_INDEX_NAME,
+    EMBEDDING_DIMENSION,
     LOG_LEVEL
 )
-from generate_embeddings import CloudflareEmbedder, PineconeIndexManager
+from generate_embeddings import get_shared_embedder, get_shared_index_manager
 
 # Setup logging
 logging.basicConfig(
@@ -30,12 +54,226 @@ if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+# Lowercase + space->underscore in one C-level pass instead of chained
+# .lower().replace() copies. Romanian uppercase diacritics (and their
+# legacy cedilla forms) are included so namespaces keep matching what
+# .lower() produced
+_NORM_TABLE = str.maketrans(
+    string.ascii_uppercase + 'ĂÂÎȘȚŞŢ ',
+    string.ascii_lowercase + 'ăâîșțşţ_'
+)
+
+
+@lru_cache(maxsize=64)
+def _normalize_name(name: str) -> str:
+    """Normalize a school/class name to its namespace form"""
+    return name.translate(_NORM_TABLE)
+
+
+@lru_cache(maxsize=1024)
+def _fold_text(text: str) -> str:
+    """
+    Casefold and strip diacritics for matching
+
+    Romanian queries mix accented and plain spellings ("matematică" vs
+    "matematica"); folding both sides keeps keyword routing on the fast
+    path instead of falling through to the all-namespaces fan-out.
+    """
+    return unicodedata.normalize('NFKD', text.casefold()).encode('ascii', 'ignore').decode()
+
+
+class SemanticCache:
+    """
+    Serve repeated (and near-duplicate) queries from memory
+
+    Cached query embeddings are L2-normalized rows of a preallocated
+    matrix, so a lookup is one dot product against every cached entry; a
+    hit above the similarity threshold returns the stored Pinecone
+    results without touching Cloudflare or Pinecone. Entries expire by
+    TTL and the matrix is a ring buffer, so inserts are O(1) and memory
+    is capped. Inactive when numpy is not installed.
+    """
+
+    CAPACITY = 4096
+    SIMILARITY_THRESHOLD = 0.95
+    TTL_SECONDS = 300.0
+
+    def __init__(self, capacity=CAPACITY, threshold=SIMILARITY_THRESHOLD, ttl=TTL_SECONDS):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._matrix = (
+            np.zeros((capacity, EMBEDDING_DIMENSION), dtype=np.float32)
+            if NUMPY_AVAILABLE else None
+        )
+        self._entries = [None] * capacity  # (namespace, results, monotonic ts)
+        self._size = 0
+        self._cursor = 0  # Next ring-buffer slot to overwrite
+
+    @staticmethod
+    def _normalize(embedding):
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def get(self, query_embedding, namespace: Optional[str]) -> Optional[List[Dict]]:
+        """Return cached results for a similar-enough query, or None"""
+        if not NUMPY_AVAILABLE or self._size == 0:
+            return None
+
+        q_vec = self._normalize(query_embedding)
+        sims = self._matrix[:self._size] @ q_vec
+        candidates = np.nonzero(sims >= self.threshold)[0]
+        now = time.monotonic()
+
+        # Best-first: the closest entry with matching namespace and live TTL
+        for idx in candidates[np.argsort(sims[candidates])[::-1]]:
+            entry = self._entries[idx]
+            if entry is None:
+                continue
+            cached_ns, results, ts = entry
+            if cached_ns == namespace and now - ts <= self.ttl:
+                self.hits += 1
+                logger.info(f"Semantic cache hit (similarity {sims[idx]:.3f})")
+                return results
+
+        self.misses += 1
+        return None
+
+    def put(self, query_embedding, namespace: Optional[str], results: List[Dict]):
+        """Insert a query embedding and its results at the ring cursor"""
+        if not NUMPY_AVAILABLE:
+            return
+        self._matrix[self._cursor] = self._normalize(query_embedding)
+        self._entries[self._cursor] = (namespace, results, time.monotonic())
+        self._cursor = (self._cursor + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
 
 class SubjectRouter:
     """Route queries to appropriate subject namespaces based on keywords"""
 
+    # Keyword matches needed for full routing confidence; see route_query
+    CONFIDENCE_KEYWORD_CAP = 5
+
     def __init__(self):
-        self.subject_mapping = self._load_subject_mapping()
+        if not self._load_cached_bundle():
+            self.subject_mapping = self._load_subject_mapping()
+            self._subjects_lc = self._normalize_subjects()
+            self.automaton = self._build_automaton()
+            self._save_cached_bundle()
+
+    # Bump when the processed bundle layout or normalization changes, so
+    # stale pickles rebuild instead of resurrecting old behavior
+    _BUNDLE_VERSION = 2
+
+    @staticmethod
+    def _cache_paths():
+        """Paths of the mapping JSON and its processed pickle cache"""
+        mapping_file = Path(__file__).parent / 'subject_mapping.json'
+        return mapping_file, mapping_file.with_suffix('.pkl')
+
+    def _load_cached_bundle(self) -> bool:
+        """
+        Load the pickled routing bundle if it is newer than the JSON
+
+        The mapping, its lowercased view and the keyword automaton are
+        cached together so repeated CLI invocations skip the JSON parse
+        and automaton build. Any problem with the cache just falls back
+        to rebuilding from the JSON.
+        """
+        mapping_file, cache_file = self._cache_paths()
+        try:
+            if not (mapping_file.exists() and cache_file.exists()):
+                return False
+            if cache_file.stat().st_mtime < mapping_file.stat().st_mtime:
+                return False
+            with open(cache_file, 'rb') as f:
+                bundle = pickle.load(f)
+            if bundle.get('version') != self._BUNDLE_VERSION:
+                return False
+            # Rebuild when pyahocorasick (dis)appears since the bundle was
+            # built, else a cached automaton-less bundle would keep the
+            # fast path disabled after the dependency is installed
+            if bundle.get('ahocorasick') != AHOCORASICK_AVAILABLE:
+                return False
+            self.subject_mapping = bundle['mapping']
+            self._subjects_lc = bundle['subjects_lc']
+            self.automaton = bundle['automaton']
+            return True
+        except Exception as e:
+            logger.warning(f"Ignoring routing cache ({e}); rebuilding from JSON")
+            return False
+
+    def _save_cached_bundle(self):
+        """Persist the processed routing bundle; best-effort only"""
+        if not self.subject_mapping:
+            return
+        _, cache_file = self._cache_paths()
+        try:
+            with open(cache_file, 'wb') as f:
+                pickle.dump(
+                    {
+                        'version': self._BUNDLE_VERSION,
+                        'ahocorasick': AHOCORASICK_AVAILABLE,
+                        'mapping': self.subject_mapping,
+                        'subjects_lc': self._subjects_lc,
+                        'automaton': self.automaton
+                    },
+                    f,
+                    protocol=pickle.HIGHEST_PROTOCOL
+                )
+        except Exception as e:
+            logger.warning(f"Could not write routing cache: {e}")
+
+    def _normalize_subjects(self) -> List[Dict]:
+        """
+        Precompute lowercased views of the static subject mapping
+
+        The mapping never changes after load, so primary names, aliases
+        and keywords are lowercased once here instead of on every query.
+        """
+        if not self.subject_mapping:
+            return []
+        normalized = []
+        for subject_config in self.subject_mapping.get('subjects', []):
+            primary = subject_config['primary']
+            normalized.append({
+                'primary': primary,
+                'primary_lc': _fold_text(primary),
+                'aliases_lc': frozenset(_fold_text(alias) for alias in subject_config.get('aliases', [])),
+                'keywords_lc': tuple(_fold_text(kw) for kw in subject_config.get('keywords', [])),
+                'namespace': subject_config.get('namespace', primary.lower().replace(' ', '_'))
+            })
+        return normalized
+
+    def _build_automaton(self):
+        """
+        Compile all subject keywords into one Aho-Corasick automaton
+
+        Routing then makes a single linear pass over the query instead of
+        one substring scan per keyword per subject. A keyword shared by
+        several subjects carries every subject index, matching the
+        per-subject tally of the fallback loop.
+        """
+        if not AHOCORASICK_AVAILABLE or not self._subjects_lc:
+            return None
+
+        keyword_subjects = {}
+        for idx, entry in enumerate(self._subjects_lc):
+            for kw in entry['keywords_lc']:
+                keyword_subjects.setdefault(kw, []).append(idx)
+
+        if not keyword_subjects:
+            return None
+
+        automaton = ahocorasick.Automaton()
+        for word, idxs in keyword_subjects.items():
+            automaton.add_word(word, (word, tuple(idxs)))
+        automaton.make_automaton()
+        return automaton
 
     def _load_subject_mapping(self) -> Dict:
         """Load subject mapping configuration"""
@@ -57,7 +295,23 @@ class SubjectRouter:
             return []
         return [subj['primary'] for subj in self.subject_mapping.get('subjects', [])]
 
-    def route_query(self, query: str, school: str, class_name: str) -> Optional[str]:
+    def get_all_namespaces(self, school: str, class_name: str) -> List[str]:
+        """
+        Build the namespace for every mapped subject
+
+        Args:
+            school: School name (normalized, e.g., "scoala_normala")
+            class_name: Class name (normalized, e.g., "clasa_0")
+
+        Returns:
+            list: One {school}_{class}_{subject} namespace per subject
+        """
+        return [
+            f"{school}_{class_name}_{entry['namespace']}"
+            for entry in self._subjects_lc
+        ]
+
+    def route_query(self, query: str, school: str, class_name: str) -> tuple:
         """
         Route query to appropriate subject namespace based on keywords
 
@@ -67,32 +321,53 @@ class SubjectRouter:
             class_name: Class name (normalized, e.g., "clasa_0")
 
         Returns:
-            str: Recommended namespace or None if no match found
+            tuple: (namespace, confidence, subject) where confidence is
+            the winning subject's distinct keyword matches over a capped
+            keyword count (a couple of matches is already a strong
+            signal) and subject is its display name, or (None, 0.0, None)
+            if no match found
         """
         if not self.subject_mapping:
             logger.warning("No subject mapping available for auto-routing")
-            return None
+            return None, 0.0, None
 
-        query_lower = query.lower()
+        query_lower = _fold_text(query)
         best_match = None
         best_score = 0
 
-        for subject_config in self.subject_mapping.get('subjects', []):
-            keywords = subject_config.get('keywords', [])
-            matches = sum(1 for kw in keywords if kw.lower() in query_lower)
+        if self.automaton is not None:
+            # One DFA pass over the query; distinct matched keywords are
+            # tallied per subject, same scoring as the fallback loop
+            matched = [set() for _ in self._subjects_lc]
+            for _, (word, idxs) in self.automaton.iter(query_lower):
+                for idx in idxs:
+                    matched[idx].add(word)
+            for entry, words in zip(self._subjects_lc, matched):
+                if len(words) > best_score:
+                    best_score = len(words)
+                    best_match = entry
+        else:
+            for entry in self._subjects_lc:
+                matches = sum(1 for kw in entry['keywords_lc'] if kw in query_lower)
 
-            if matches > best_score:
-                best_score = matches
-                best_match = subject_config
+                if matches > best_score:
+                    best_score = matches
+                    best_match = entry
 
         if best_match:
-            subject_ns = best_match.get('namespace', best_match['primary'].lower().replace(' ', '_'))
-            namespace = f"{school}_{class_name}_{subject_ns}"
-            logger.info(f"Auto-routed to subject '{best_match['primary']}' ({matches} keyword matches)")
-            return namespace
+            namespace = f"{school}_{class_name}_{best_match['namespace']}"
+            # Cap the denominator: subjects carry ~20 keywords, and a
+            # query naming two or three of them is already a confident
+            # match - dividing by the full list would leave realistic
+            # one-or-two-keyword queries permanently under any threshold
+            keyword_count = min(max(len(best_match['keywords_lc']), 1), self.CONFIDENCE_KEYWORD_CAP)
+            confidence = min(1.0, best_score / keyword_count)
+            logger.info(f"Auto-routed to subject '{best_match['primary']}' "
+                        f"({best_score} keyword matches, confidence {confidence:.2f})")
+            return namespace, confidence, best_match['primary']
         else:
             logger.info("No matching subject found in keywords")
-            return None
+            return None, 0.0, None
 
     def find_namespace(self, query: str, subject: str, school: str, class_name: str) -> Optional[str]:
         """
@@ -107,15 +382,14 @@ class SubjectRouter:
         Returns:
             str: Namespace or None if subject not found
         """
-        if not self.subject_mapping:
+        if not self._subjects_lc:
             return None
 
-        # Find subject by primary name or alias
-        for subject_config in self.subject_mapping.get('subjects', []):
-            if (subject.lower() == subject_config['primary'].lower() or
-                subject.lower() in [alias.lower() for alias in subject_config.get('aliases', [])]):
-                subject_ns = subject_config.get('namespace', subject.lower().replace(' ', '_'))
-                namespace = f"{school}_{class_name}_{subject_ns}"
+        # Find subject by primary name or alias (both pre-folded)
+        subject_lc = _fold_text(subject)
+        for entry in self._subjects_lc:
+            if subject_lc == entry['primary_lc'] or subject_lc in entry['aliases_lc']:
+                namespace = f"{school}_{class_name}_{entry['namespace']}"
                 logger.info(f"Using explicit subject namespace: {namespace}")
                 return namespace
 
@@ -126,10 +400,15 @@ class SubjectRouter:
 class DualInterfaceSearch:
     """Dual-interface search supporting both explicit and auto-route modes"""
 
+    # Routed matches below this keyword-coverage ratio go straight to the
+    # all-namespaces fallback instead of a targeted search first
+    MIN_ROUTE_CONFIDENCE = 0.1
+
     def __init__(self):
-        self.embedder = CloudflareEmbedder()
-        self.pinecone_manager = PineconeIndexManager()
+        self.embedder = get_shared_embedder()
+        self.pinecone_manager = get_shared_index_manager()
         self.router = SubjectRouter()
+        self.cache = SemanticCache()
 
     def search_with_subject(self, query: str, subject: str, school: str = "scoala_normala",
                            class_name: str = "clasa_0", top_k: int = 5) -> List[Dict]:
@@ -149,8 +428,8 @@ class DualInterfaceSearch:
         logger.info(f"Explicit search - Subject: {subject}, Query: {query}")
 
         # Find namespace for subject
-        namespace = self.router.find_namespace(query, subject, school.lower().replace(' ', '_'),
-                                               class_name.lower().replace(' ', '_'))
+        namespace = self.router.find_namespace(query, subject, _normalize_name(school),
+                                               _normalize_name(class_name))
 
         if not namespace:
             logger.error(f"Could not find namespace for subject: {subject}")
@@ -158,14 +437,20 @@ class DualInterfaceSearch:
 
         # Generate embedding for query
         query_embedding = self.embedder.generate_embedding(query)
-        if not query_embedding:
+        if query_embedding is None or len(query_embedding) == 0:
             logger.error("Failed to generate query embedding")
             return []
 
+        # Near-duplicate query against the same namespace: skip Pinecone
+        cached = self.cache.get(query_embedding, namespace)
+        if cached is not None:
+            return cached
+
         # Search in the specific namespace
         results = self.pinecone_manager.search(query_embedding, top_k=top_k, namespace=namespace)
         logger.info(f"Found {len(results)} results in {subject}")
 
+        self.cache.put(query_embedding, namespace, results)
         return results
 
     def search_with_auto_route(self, query: str, school: str = "scoala_normala",
@@ -185,16 +470,19 @@ class DualInterfaceSearch:
         logger.info(f"Auto-route search - Query: {query}")
 
         # Normalize school and class
-        school_norm = school.lower().replace(' ', '_')
-        class_norm = class_name.lower().replace(' ', '_')
+        school_norm = _normalize_name(school)
+        class_norm = _normalize_name(class_name)
 
         # Route to subject based on keywords
-        namespace = self.router.route_query(query, school_norm, class_norm)
-
-        if not namespace:
-            logger.warning("No matching subject found, searching default namespace")
-            # Fall back to default namespace (all subjects)
-            results = self._search_all_namespaces(query, top_k)
+        namespace, confidence, subject_name = self.router.route_query(query, school_norm, class_norm)
+
+        # A sub-threshold match would likely need the fallback search
+        # anyway, so skip the targeted Pinecone query and go straight
+        # there - one round trip instead of two
+        if not namespace or confidence < self.MIN_ROUTE_CONFIDENCE:
+            logger.warning("No confident subject match, searching all subject namespaces")
+            # Fall back to fanning out across every subject namespace
+            results = self._search_all_namespaces(query, top_k, school_norm, class_norm)
             return {
                 'subject': 'All Subjects',
                 'results': results,
@@ -204,36 +492,60 @@ class DualInterfaceSearch:
 
         # Generate embedding for query
         query_embedding = self.embedder.generate_embedding(query)
-        if not query_embedding:
+        if query_embedding is None or len(query_embedding) == 0:
             logger.error("Failed to generate query embedding")
             return {'subject': 'Error', 'results': [], 'confidence': 0.0}
 
-        # Search in the routed namespace
-        results = self.pinecone_manager.search(query_embedding, top_k=top_k, namespace=namespace)
-
-        # Extract subject name from namespace for display
-        parts = namespace.split('_')
-        subject_name = ' '.join(parts[2:]) if len(parts) > 2 else 'Unknown'
+        # Near-duplicate query against the same namespace: skip Pinecone
+        results = self.cache.get(query_embedding, namespace)
+        if results is None:
+            results = self.pinecone_manager.search(query_embedding, top_k=top_k, namespace=namespace)
+            self.cache.put(query_embedding, namespace, results)
 
         logger.info(f"Auto-routed to '{subject_name}' with {len(results)} results")
 
         return {
-            'subject': subject_name.title(),
+            'subject': subject_name,
             'results': results,
-            'confidence': 1.0,  # Placeholder - could be improved with keyword match percentage
+            'confidence': confidence,
             'mode': 'auto_route'
         }
 
-    def _search_all_namespaces(self, query: str, top_k: int = 5) -> List[Dict]:
-        """Search across all available subjects"""
+    def _search_all_namespaces(self, query: str, top_k: int = 5,
+                               school: str = "scoala_normala",
+                               class_name: str = "clasa_0") -> List[Dict]:
+        """
+        Search across all available subjects
+
+        The query is embedded once, then fanned out over every subject
+        namespace in parallel; per-namespace top-k lists are merged into
+        one global top-k by score.
+        """
         logger.info("Searching across all namespaces")
         query_embedding = self.embedder.generate_embedding(query)
-        if not query_embedding:
+        if query_embedding is None or len(query_embedding) == 0:
             return []
 
-        # Search default namespace (which has all vectors if no namespaces are used)
-        results = self.pinecone_manager.search(query_embedding, top_k=top_k)
-        return results
+        namespaces = self.router.get_all_namespaces(school, class_name)
+        if not namespaces:
+            # No mapping: everything lives in the default namespace
+            return self.pinecone_manager.search(query_embedding, top_k=top_k)
+
+        with ThreadPoolExecutor(max_workers=min(len(namespaces), 8)) as executor:
+            futures = [
+                executor.submit(self.pinecone_manager.search, query_embedding, top_k, ns)
+                for ns in namespaces
+            ]
+            per_namespace = [future.result() for future in futures]
+
+        # Each namespace list arrives sorted by score, so a k-way merge
+        # yields the global ranking lazily and islice stops after top_k
+        merged = heapq.merge(
+            *per_namespace,
+            key=lambda match: match.get('score', 0),
+            reverse=True
+        )
+        return list(itertools.islice(merged, top_k))
 
     def list_subjects(self) -> List[str]:
         """List all available subjects"""
@@ -245,6 +557,53 @@ class DualInterfaceSearch:
         return self.pinecone_manager.get_index_stats()
 
 
+def _print_results_block(title_lines: List[str], results: List[Dict]):
+    """Print one framed block of search results"""
+    print("\n" + "=" * 60)
+    for line in title_lines:
+        print(line)
+    print("=" * 60)
+
+    if results:
+        for i, match in enumerate(results, 1):
+            text = match.get('metadata', {}).get('text', 'N/A')
+            score = match.get('score', 0)
+            print(f"\n[{i}] Score: {score:.4f}")
+            print(f"Content: {text[:300]}...")
+    else:
+        print("No results found.")
+
+    print("=" * 60 + "\n")
+
+
+def _run_query(search: 'DualInterfaceSearch', args, query: str):
+    """Run one query in the mode selected by the CLI flags"""
+    if args.subject:
+        results = search.search_with_subject(
+            query=query,
+            subject=args.subject,
+            school=args.school,
+            class_name=args.class_name,
+            top_k=args.top_k
+        )
+        _print_results_block(
+            [f"SEARCH RESULTS - Subject: {args.subject}", f"Query: {query}"],
+            results
+        )
+    else:
+        result = search.search_with_auto_route(
+            query=query,
+            school=args.school,
+            class_name=args.class_name,
+            top_k=args.top_k
+        )
+        _print_results_block(
+            [f"SEARCH RESULTS - Subject: {result['subject']}",
+             f"Mode: {result['mode'].upper()}"],
+            result['results']
+        )
+
+
 def main():
     """Main entry point with CLI argument handling"""
     parser = argparse.ArgumentParser(
@@ -309,6 +668,12 @@ Examples:
         action='store_true',
         help='Show Pinecone index statistics'
     )
+    parser.add_argument(
+        '--repl',
+        action='store_true',
+        help='Read queries from stdin in a loop, reusing one search session '
+             '(explicit mode if --subject is given, else auto-route)'
+    )
 
     args = parser.parse_args()
 
@@ -336,57 +701,18 @@ Examples:
         print("=" * 40 + "\n")
         return
 
-    if args.auto_route and args.query:
-        # Auto-route mode
-        result = search.search_with_auto_route(
-            query=args.query,
-            school=args.school,
-            class_name=args.class_name,
-            top_k=args.top_k
-        )
-
-        print("\n" + "=" * 60)
-        print(f"SEARCH RESULTS - Subject: {result['subject']}")
-        print(f"Mode: {result['mode'].upper()}")
-        print("=" * 60)
-
-        if result['results']:
-            for i, match in enumerate(result['results'], 1):
-                text = match.get('metadata', {}).get('text', 'N/A')
-                score = match.get('score', 0)
-                print(f"\n[{i}] Score: {score:.4f}")
-                print(f"Content: {text[:300]}...")
-        else:
-            print("No results found.")
-
-        print("=" * 60 + "\n")
+    if args.repl:
+        # Parse/build once, then serve queries in a loop: the Cloudflare
+        # session, Pinecone connection and semantic cache are all reused
+        print("Interactive mode - one query per line (Ctrl-D to exit)")
+        for line in sys.stdin:
+            query = line.strip()
+            if query:
+                _run_query(search, args, query)
         return
 
-    if args.subject and args.query:
-        # Explicit subject mode
-        results = search.search_with_subject(
-            query=args.query,
-            subject=args.subject,
-            school=args.school,
-            class_name=args.class_name,
-            top_k=args.top_k
-        )
-
-        print("\n" + "=" * 60)
-        print(f"SEARCH RESULTS - Subject: {args.subject}")
-        print(f"Query: {args.query}")
-        print("=" * 60)
-
-        if results:
-            for i, match in enumerate(results, 1):
-                text = match.get('metadata', {}).get('text', 'N/A')
-                score = match.get('score', 0)
-                print(f"\n[{i}] Score: {score:.4f}")
-                print(f"Content: {text[:300]}...")
-        else:
-            print("No results found.")
-
-        print("=" * 60 + "\n")
+    if (args.auto_route or args.subject) and args.query:
+        _run_query(search, args, args.query)
         return
 
     # No valid mode selected
@@ -17,17 +17,19 @@ if sys.stdout.encoding != 'utf-8':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8', errors='replace')
 
+import heapq
 import json
 import logging
-import time
+import operator
 import os
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from pathlib import Path
 
 # Only import these if API keys are configured
 try:
-    from generate_embeddings import CloudflareEmbedder, PineconeIndexManager
+    from generate_embeddings import get_shared_embedder, get_shared_index_manager
     APIS_AVAILABLE = True
 except ImportError:
     APIS_AVAILABLE = False
@@ -49,8 +51,8 @@ class SearchTester:
         if not APIS_AVAILABLE:
             raise RuntimeError("API libraries not available. Install from requirements.txt")
 
-        self.embedder = CloudflareEmbedder()
-        self.pinecone_manager = PineconeIndexManager()
+        self.embedder = get_shared_embedder()
+        self.pinecone_manager = get_shared_index_manager()
 
     def search_query(self, query: str, top_k: int = 5) -> List[dict]:
         """
@@ -94,16 +96,35 @@ class SearchTester:
 
         results_summary = []
 
-        for i, query in enumerate(test_queries, 1):
+        # One batched call embeds every query, then the Pinecone searches
+        # run in parallel; only the printing below is sequential
+        query_embeddings = [None] * len(test_queries)
+        for idx, _, embedding in self.embedder.generate_embeddings_batch(test_queries):
+            query_embeddings[idx] = embedding
+
+        def run_search(embedding):
+            if embedding is None:
+                return []
+            try:
+                return self.pinecone_manager.search(embedding, top_k=top_k)
+            except Exception as e:
+                logger.error(f"Search error: {e}")
+                return []
+
+        with ThreadPoolExecutor(max_workers=min(len(test_queries), 8)) as executor:
+            all_results = list(executor.map(run_search, query_embeddings))
+
+        # C-level key extraction; every Pinecone match carries a score
+        score_of = operator.itemgetter('score')
+
+        for i, (query, results) in enumerate(zip(test_queries, all_results), 1):
             print(f"Test {i}/{len(test_queries)}")
             print(f"Query: '{query}'")
             print("-" * 80)
 
-            results = self.search_query(query, top_k=top_k)
-
             if results:
-                # Sort results by score descending to ensure correct ranking
-                sorted_results = sorted(results, key=lambda x: x.get('score', 0), reverse=True)
+                # Top-k by score without sorting the full result list
+                sorted_results = heapq.nlargest(top_k, results, key=score_of)
                 print(f"Found {len(sorted_results)} results:\n")
 
                 for rank, result in enumerate(sorted_results, 1):
@@ -133,7 +154,6 @@ class SearchTester:
                 })
 
             print("="*80 + "\n")
-            time.sleep(1)  # Delay between searches
 
         # Print summary
         print("SEARCH TEST SUMMARY")